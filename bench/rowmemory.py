@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+"""
+	Memory used by each value set of a ParamMulti, for every storage mode.
+
+	Every object reachable from the rows is counted once with
+	sys.getsizeof, except the objects already reachable from the schema
+	(the ParamMulti items), which are shared by all rows.
+
+	Usage: python bench/rowmemory.py [rows]
+"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import paramPy
+from paramPy.Stats import deepSize
+
+def schema(storage):
+	return paramPy.ParamMulti(
+		id='tracker',
+		label='Torrent provider',
+		storage=storage,
+		items=[
+			paramPy.ConfigElement(id='id',type='text',label='Torrents provider',choices={'t411':'T411','kickass':'KickAss'},required=True,default='kickass',trigger={'kickass':'NoLogin'}),
+			paramPy.ConfigElement(id='slots',type='number',label='Maximum slots'),
+			paramPy.ConfigElement(id='enabled',type='boolean',label='Enabled'),
+			paramPy.Param(id='login',label='Login',items=[
+				paramPy.ConfigElement(id='user',type='text',label='Username'),
+				paramPy.ConfigElement(id='password',type='password',label='Password')
+				])
+			],
+		trigger=[{'src_id':'id','src_status':'NoLogin','dst_id':'login','dst_status':'disabled'}]
+		)
+
+def rows(count):
+	return [{'id':'t411' if i%2 else 'kickass','slots':i%7,'enabled':i%3 == 0,'login':{'user':'user','password':'secret'}} for i in xrange(count)]
+
+def measure(storage,count):
+	multi = schema(storage)
+	multi.loadValuesFromJSON({'tracker':rows(count)})
+	seen = set([id(multi)])
+	deepSize(multi.items,seen)
+	deepSize(multi.graph,seen)
+	deepSize(multi.trigger,seen)
+	return deepSize(multi.values,seen) / float(count)
+
+if __name__ == '__main__':
+	count = int(sys.argv[1]) if len(sys.argv)>1 else 2000
+	print json.dumps(dict((storage,round(measure(storage,count),1)) for storage in ['param','shared','columnar']),sort_keys=True)
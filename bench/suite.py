@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+"""
+	Non-interactive benchmark of the main paramPy operations on synthetic
+	schemas and values.
+
+	The generated tree has ``--items`` ConfigElements per Param, Params
+	nested ``--depth`` levels deep and, at the top level, a ParamMulti of
+	``--rows`` value sets. The first ``--choices`` values are offered to
+	the first text element of every Param, and ``--triggers`` rules chain
+	the elements of every Param.
+
+	Every operation is run ``--repeat`` times on a fresh setup. Results
+	are printed (or written to ``--output``) as JSON: best and mean time in
+	seconds, and growth of the peak resident memory in KB during the first
+	run. ``--stats`` adds the instrumentation counters of paramPy.Stats.
+
+	Usage: python bench/suite.py [--items 20] [--depth 3] [--rows 1000] ...
+"""
+
+import os
+import sys
+import gc
+import copy
+import json
+import time
+import platform
+import resource
+import tempfile
+import argparse
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import paramPy
+from paramPy import Stats
+
+TYPES = ['text','number','boolean','email','password']
+
+##############
+## Synthetic schemas and values
+##############
+def elementSchema(pos,triggers,choices):
+	type = TYPES[pos % len(TYPES)]
+	schema = {'id':'e{0}'.format(pos),'type':type,'label':'Element {0}'.format(pos)}
+	if pos == 0 and choices > 0:
+		schema['choices'] = ['c{0}'.format(choice) for choice in xrange(choices)]
+	if pos < triggers:
+		schema['trigger'] = {None:'off','*':'on'}
+	return schema
+
+def paramSchema(id,options,depth,multi=False):
+	items = [elementSchema(pos,options.triggers,options.choices) for pos in xrange(options.items)]
+	rules = [{'src_id':'e{0}'.format(pos),'src_status':'on','dst_id':'e{0}'.format(pos+1),'dst_status':'disabled'} for pos in xrange(min(options.triggers,options.items-1))]
+	if multi:
+		return {'id':id,'type':'ParamMulti','label':id,'items':items,'trigger':rules,'storage':options.storage}
+	if depth > 1:
+		items.append(paramSchema('p{0}'.format(depth-1),options,depth-1))
+	return {'id':id,'type':'Param','label':id,'items':items,'trigger':rules}
+
+def makeSchema(options):
+	schema = paramSchema('root',options,options.depth)
+	if options.rows > 0:
+		schema['items'].append(paramSchema('rows',options,1,multi=True))
+	return schema
+
+def elementValue(schema,seed):
+	if 'choices' in schema:
+		return schema['choices'][seed % len(schema['choices'])]
+	type = schema['type']
+	if type == 'number':
+		return seed
+	if type == 'boolean':
+		return seed % 2 == 0
+	if type == 'email':
+		return 'user{0}@example.com'.format(seed)
+	if type == 'password':
+		return 'secret{0}'.format(seed)
+	return 'value{0}'.format(seed)
+
+def makeValues(schema,options,seed=0):
+	values = {}
+	for item in schema['items']:
+		if item['type'] == 'ParamMulti':
+			values[item['id']] = [makeValues(item,options,row) for row in xrange(options.rows)]
+		elif item['type'] == 'Param':
+			values[item['id']] = makeValues(item,options,seed)
+		else:
+			values[item['id']] = elementValue(item,seed)
+	return values
+
+def build(schema):
+	return paramPy.ParamFromJSON(schema)
+
+def nodes(item):
+	result = [item]
+	for child in item.items:
+		if isinstance(child,paramPy.Param):
+			result.extend(nodes(child))
+	return result
+
+def statuses(item):
+	for node in nodes(item):
+		node.statusChanged()
+		for child in node.items:
+			node.getStatus(child.id)
+		node.getStatus()
+
+##############
+## Runner
+##############
+def peakRSS():
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def bench(name,setup,run,repeat):
+	times = []
+	rss = 0
+	for count in xrange(repeat):
+		arg = setup()
+		gc.collect()
+		before = peakRSS()
+		start = time.time()
+		run(arg)
+		times.append(time.time() - start)
+		if count == 0:
+			rss = peakRSS() - before
+	return name,{'seconds':min(times),'mean':sum(times)/len(times),'rssKB':rss}
+
+def main(options):
+	schema = makeSchema(options)
+	values = makeValues(schema,options)
+	directory = tempfile.mkdtemp(prefix='paramPy-bench-')
+	valuesFile = os.path.join(directory,'values.json')
+	savedFile = os.path.join(directory,'saved.json')
+	with open(valuesFile,'w') as outfile:
+		json.dump(values,outfile)
+
+	def loaded():
+		item = build(schema)
+		item.loadValuesFromJSON({item.id:copy.deepcopy(values)})
+		return item
+
+	results = dict([
+		bench('ParamFromJSON',lambda: None,lambda arg: build(schema),options.repeat),
+		bench('loadValuesFromJSON',lambda: (build(schema),copy.deepcopy(values)),lambda arg: arg[0].loadValuesFromJSON({arg[0].id:arg[1]}),options.repeat),
+		bench('loadFromFile',lambda: build(schema),lambda item: item.loadFromFile(valuesFile),options.repeat),
+		bench('loadFromFile(stream)',lambda: build(schema),lambda item: item.loadFromFile(valuesFile,stream=True),options.repeat),
+		bench('getValues',loaded,lambda item: item.getValues(),options.repeat),
+		bench('toJSON',loaded,lambda item: item.toJSON(),options.repeat),
+		bench('saveToFile',loaded,lambda item: item.saveToFile(savedFile),options.repeat),
+		bench('getStatus',loaded,statuses,options.repeat),
+		bench('deepcopy',loaded,copy.deepcopy,options.repeat)
+		])
+
+	item = loaded()
+	report = {
+		'python':	platform.python_version(),
+		'options':	vars(options),
+		'elements':	sum(len(node.items) for node in nodes(item)) + options.rows * options.items,
+		'valuesBytes':	os.path.getsize(valuesFile),
+		'treeBytes':	Stats.footprint(item)['bytes'],
+		'results':	results
+		}
+	if Stats.isEnabled():
+		report['stats'] = Stats.snapshot()
+	for filename in [valuesFile,savedFile]:
+		if os.path.exists(filename):
+			os.remove(filename)
+	os.rmdir(directory)
+	return report
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='paramPy benchmark suite')
+	parser.add_argument('--items',type=int,default=20,help='ConfigElements per Param')
+	parser.add_argument('--depth',type=int,default=3,help='nesting depth of Params')
+	parser.add_argument('--rows',type=int,default=1000,help='value sets of the top level ParamMulti')
+	parser.add_argument('--triggers',type=int,default=5,help='trigger rules per Param')
+	parser.add_argument('--choices',type=int,default=10,help='size of the choice list')
+	parser.add_argument('--storage',default='param',choices=['param','shared','columnar','lazy'],help='storage of the ParamMulti')
+	parser.add_argument('--repeat',type=int,default=3,help='runs of each operation')
+	parser.add_argument('--output',default=None,help='JSON file to write the results to')
+	parser.add_argument('--stats',action='store_true',help='also report the instrumentation counters (slower)')
+	options = parser.parse_args()
+	if options.stats:
+		Stats.enable()
+	report = json.dumps(main(options),indent=4,sort_keys=True)
+	if options.output is None:
+		print report
+	else:
+		with open(options.output,'w') as outfile:
+			outfile.write(report + '\n')
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+from array import array
+
+##############
+## ObjectColumn
+##############
+class ObjectColumn(object):
+	def __init__(self,values=[]):
+		self.data = [self.pack(value) for value in values]
+
+	def pack(self,value):
+		return value
+
+	def __len__(self):
+		return len(self.data)
+
+	def __getitem__(self,key):
+		return self.data[key]
+
+	def __setitem__(self,key,value):
+		self.data[key] = self.pack(value)
+
+	def __delitem__(self,key):
+		del self.data[key]
+
+	def append(self,value):
+		self.data.append(self.pack(value))
+
+	def insert(self,key,value):
+		self.data.insert(key,self.pack(value))
+
+	def extend(self,values):
+		self.data.extend(self.pack(value) for value in values)
+
+	def values(self):
+		return list(self.data)
+
+	def copy(self):
+		newone = type(self)()
+		newone.data = list(self.data)
+		return newone
+
+##############
+## TextColumn
+##############
+class TextColumn(ObjectColumn):
+	def pack(self,value):
+		return intern(value) if type(value) is str else value
+
+	def __setstate__(self,state):
+		self.__dict__.update(state)
+		self.data = [self.pack(value) for value in self.data]
+
+##############
+## BooleanColumn
+##############
+class BooleanColumn(ObjectColumn):
+	UNPACK = {-1:None,0:False,1:True}
+
+	def __init__(self,values=[]):
+		self.data = array('b',[self.pack(value) for value in values])
+
+	def pack(self,value):
+		if value is None:
+			return -1
+		return 1 if value else 0
+
+	def __getitem__(self,key):
+		return self.UNPACK[self.data[key]]
+
+	def values(self):
+		unpack = self.UNPACK
+		return [unpack[value] for value in self.data]
+
+	def copy(self):
+		newone = type(self)()
+		newone.data = array('b',self.data)
+		return newone
+
+##############
+## NumberColumn
+##############
+class NumberColumn(object):
+	# flags: 0 value in data, 1 None, 2 value too wide for data (kept in wide)
+	def __init__(self,values=[]):
+		self.data = array('l')
+		self.flags = array('b')
+		self.wide = {}
+		self.special = 0
+		self.extend(values)
+
+	def __len__(self):
+		return len(self.data)
+
+	def __getitem__(self,key):
+		if key < 0:
+			key += len(self.data)
+		flag = self.flags[key]
+		if flag == 0:
+			return self.data[key]
+		if flag == 1:
+			return None
+		return self.wide[key]
+
+	def __setitem__(self,key,value):
+		if key < 0:
+			key += len(self.data)
+		if self.flags[key] != 0:
+			self.special -= 1
+			self.wide.pop(key,None)
+		self.data[key],self.flags[key] = self.pack(key,value)
+
+	def __delitem__(self,key):
+		if key < 0:
+			key += len(self.data)
+		if self.flags[key] != 0:
+			self.special -= 1
+		del self.data[key]
+		del self.flags[key]
+		if len(self.wide)>0:
+			self.wide = dict((pos if pos < key else pos-1,value) for pos,value in self.wide.items() if pos != key)
+
+	def insert(self,key,value):
+		if len(self.wide)>0:
+			self.wide = dict((pos if pos < key else pos+1,wide) for pos,wide in self.wide.items())
+		number,flag = self.pack(key,value)
+		self.data.insert(key,number)
+		self.flags.insert(key,flag)
+
+	def pack(self,key,value):
+		if value is None:
+			self.special += 1
+			return 0,1
+		try:
+			array('l',[value])
+		except OverflowError:
+			self.special += 1
+			self.wide[key] = value
+			return 0,2
+		return value,0
+
+	def append(self,value):
+		number,flag = self.pack(len(self.data),value)
+		self.data.append(number)
+		self.flags.append(flag)
+
+	def extend(self,values):
+		values = list(values)
+		try:
+			if None in values:
+				raise OverflowError
+			self.data.extend(array('l',values))
+			self.flags.extend(array('b',[0])*len(values))
+		except OverflowError:
+			for value in values:
+				self.append(value)
+
+	def values(self):
+		if self.special == 0:
+			return self.data.tolist()
+		return [self[pos] for pos in xrange(len(self.data))]
+
+	def copy(self):
+		newone = type(self)()
+		newone.data = array('l',self.data)
+		newone.flags = array('b',self.flags)
+		newone.wide = dict(self.wide)
+		newone.special = self.special
+		return newone
+
+def newColumn(type,values=[]):
+	if type == 'number':
+		return NumberColumn(values)
+	if type == 'boolean':
+		return BooleanColumn(values)
+	if type in ['text','password','file','email']:
+		return TextColumn(values)
+	return ObjectColumn(values)
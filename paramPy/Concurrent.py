@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import copy
+import threading
+import param
+
+##############
+## ConcurrentParam
+##############
+class ConcurrentParam(object):
+	"""
+		The ``ConcurrentParam`` class
+		=============================
+
+		Share a Param tree between threads. The tree is never modified in
+		place: writers build a new version under a lock and publish it as the
+		current snapshot, readers use whatever snapshot is current without
+		taking any lock.
+
+		``setValue`` only copies the nodes on the path to the changed value,
+		the rest of the tree is shared with the previous snapshot. Paths going
+		through 'shared', 'columnar' or 'lazy' value sets copy the whole tree.
+
+		A snapshot returned by ``snapshot`` or ``__getitem__`` must be treated
+		as read-only: use the writers of this class to change values.
+
+		:param item: Param tree to share, owned by this object afterwards
+		:type item: Param
+	"""
+	def __init__(self,item):
+		if not isinstance(item,param.Param):
+			raise TypeError("ConcurrentParam only accepts Param, not " + str(type(item)))
+		self.lock = threading.Lock()
+		self.version = 0
+		self.current = item
+
+	def __str__(self):
+		return '<ConcurrentParam {0} (Version:{1})>'.format(self.current.id,str(self.version))
+
+	def __repr__(self):
+		return str(self)
+
+	def __len__(self):
+		return len(self.current)
+
+	# Readers
+	def snapshot(self):
+		return self.current
+
+	def __getitem__(self,key):
+		return self.current[key]
+
+	def getValues(self,hidePassword=True,mode='json'):
+		return self.current.getValues(hidePassword,mode)
+
+	def view(self,hidePassword=True,hideDisabled=False):
+		return self.current.view(hidePassword,hideDisabled)
+
+	def getStatus(self,key=None):
+		return self.current.getStatus(key)
+
+	def toJSON(self):
+		return self.current.toJSON()
+
+	# Writers
+	def publish(self,item):
+		self.current = item
+		self.version += 1
+
+	def setValue(self,path,value):
+		if isinstance(path,basestring):
+			path = [path]
+		with self.lock:
+			root = ConcurrentParam.copyPath(self.current,path)
+			node = ConcurrentParam.resolve(root,path[:-1])
+			if isinstance(node,param.ParamRow):
+				node.setValue(str(path[-1]),value)
+			else:
+				item = ConcurrentParam.child(node,path[-1])
+				if not isinstance(item,param.ConfigElement):
+					raise TypeError(str(path[-1]) + ' is not a ConfigElement')
+				item.setValue(value)
+			self.publish(root)
+
+	def update(self,changes):
+		with self.lock:
+			root = copy.deepcopy(self.current)
+			root.update(changes)
+			self.publish(root)
+
+	def loadValuesFromJSON(self,values):
+		with self.lock:
+			root = copy.deepcopy(self.current)
+			root.loadValuesFromJSON(copy.deepcopy(values))
+			self.publish(root)
+
+	def loadFromFile(self,filename=None,stream=False,progress=None):
+		with self.lock:
+			root = copy.deepcopy(self.current)
+			root.loadFromFile(filename,stream,progress)
+			self.publish(root)
+
+	def saveToFile(self,filename=None):
+		with self.lock:
+			self.current.saveToFile(filename)
+
+	@staticmethod
+	def child(node,key):
+		if isinstance(key,int):
+			if isinstance(node,param.ParamMulti):
+				return node.values[key]
+			if not isinstance(node,(param.Param,param.ParamRow)):
+				return node[key]
+		if isinstance(node,param.ConfigElement):
+			raise IndexError(str(key) + ' not found in ' + str(node.id))
+		return node[str(key)]
+
+	@staticmethod
+	def resolve(node,path):
+		for key in path:
+			node = ConcurrentParam.child(node,key)
+		return node
+
+	@staticmethod
+	def copyPath(root,path):
+		node = root
+		for key in path:
+			if isinstance(node,param.ParamMulti) and node.storage != 'param':
+				return copy.deepcopy(root)
+			if not isinstance(node,param.Param):
+				break
+			node = ConcurrentParam.child(node,key)
+		newroot = ConcurrentParam.copyNode(root,None)
+		node = newroot
+		for key in path:
+			if not isinstance(node,param.Param):
+				break
+			if isinstance(node,param.ParamMulti) and isinstance(key,int):
+				newchild = ConcurrentParam.copyNode(node.values[key],node)
+				node.values[key] = newchild
+			else:
+				pos = node.layout[str(key)]
+				newchild = ConcurrentParam.copyNode(node.items[pos],node)
+				node.items[pos] = newchild
+			node = newchild
+		return newroot
+
+	@staticmethod
+	def copyNode(node,parent):
+		newone = copy.copy(node)
+		newone.parent = parent
+		if isinstance(node,param.Param):
+			newone.items = list(node.items)
+			newone.layout = node.shareLayout()
+			newone.sharedLayout = True
+			newone.statuses = dict(node.statuses) if node.statuses else None
+			newone.journal = None
+			if isinstance(node,param.ParamMulti):
+				newone.valueSets = param.RowList(newone,node.values)
+		return newone
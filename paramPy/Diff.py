@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import json
+import hashlib
+import param
+import ParamExceptions
+
+##############
+## Content hashes
+##############
+# A ConfigElement hashes its JSON value, a Param the ids and hashes of its
+# items, a ParamMulti the hashes of its value sets. A value set hashes the
+# same whether it is stored as a Param, a ParamRow or a JSON dict, so trees
+# using different storages can be compared. Passwords are hashed in clear.
+
+def valueHash(value):
+	return hashlib.sha1(json.dumps(value,sort_keys=True)).hexdigest()
+
+def itemsHash(pairs):
+	digest = hashlib.sha1()
+	for id,itemHash in pairs:
+		digest.update(json.dumps(id))
+		digest.update(itemHash)
+	return digest.hexdigest()
+
+def rowsHash(rowHashes):
+	digest = hashlib.sha1()
+	for rowHash in rowHashes:
+		digest.update(rowHash)
+	return digest.hexdigest()
+
+def jsonHash(schema,values):
+	if isinstance(schema,param.ParamMulti):
+		rows = values if isinstance(values,list) else []
+		return rowsHash([rowJSONHash(schema,row) for row in rows])
+	if isinstance(schema,param.Param):
+		return rowJSONHash(schema,values)
+	return valueHash(values)
+
+def rowHashes(multi):
+	"""
+		Hashes of the value sets of ``multi``. Value sets not stored as a
+		Param (ParamRow, JSON dicts, columns) keep their hash in
+		``multi.rowHashCache`` ([(value set or None,hash)], ids of the
+		edited value sets), kept up to date by rowsChanged and rowEdited.
+	"""
+	rows = multi.values
+	cache = multi.rowHashCache
+	entries,edited = cache if cache is not None else ([],())
+	if isinstance(rows,param.ColumnStore):
+		# None for a value set only held by the columns
+		objects = [rows.rows.get(pos) for pos in xrange(len(rows))]
+	elif isinstance(rows,param.LazyRows):
+		objects = rows.entries
+	else:
+		objects = rows
+	hashes = []
+	kept = []
+	for pos,row in enumerate(objects):
+		if isinstance(row,param.Param):
+			hashes.append(row.contentHash())
+			kept.append(None)
+			continue
+		entry = entries[pos] if pos < len(entries) else None
+		if entry is not None and entry[0] is row and id(row) not in edited:
+			digest = entry[1]
+		elif row is None:
+			digest = rowJSONHash(multi,rows.rowValues(pos,hidePassword=False))
+		else:
+			digest = rowHash(multi,row)
+		hashes.append(digest)
+		kept.append((row,digest))
+	multi.rowHashCache = (kept,set())
+	return hashes
+
+def rowHash(multi,row):
+	if isinstance(row,param.Param):
+		return row.contentHash()
+	if isinstance(row,param.ParamRow):
+		return rowJSONHash(multi,row.getValues(hidePassword=False))
+	return rowJSONHash(multi,row)
+
+def rowJSONHash(schema,values):
+	if not isinstance(values,dict):
+		values = {}
+	return itemsHash([(item.id,jsonHash(item,values.get(item.id))) for item in schema.items])
+
+##############
+## Diff and patch
+##############
+# A patch holds the values of the other tree where they differ, nested like
+# the values of loadValuesFromJSON and limited to what changed. A ParamMulti
+# whose number of value sets changed gets its whole list; otherwise a dict
+# of {"<index>": <patch of the value set>} for the value sets that differ.
+
+def diff(item,other):
+	if item.contentHash() == other.contentHash():
+		return {}
+	result = {}
+	for child in item.items:
+		pos = other.layout.get(child.id)
+		if pos is None:
+			raise ParamExceptions.WrongValue('403',str(child.id) + ' not correct for ' + str(other.id))
+		otherChild = other.items[pos]
+		if child.contentHash() == otherChild.contentHash():
+			continue
+		if isinstance(child,param.ParamMulti):
+			result[child.id] = diffRows(child,otherChild)
+		elif isinstance(child,param.Param):
+			result[child.id] = diff(child,otherChild)
+		else:
+			result[child.id] = otherChild.value
+	return result
+
+def diffRows(multi,other):
+	mine = multi.rowHashes()
+	theirs = other.rowHashes()
+	if len(mine) != len(theirs):
+		return other.getValues(hidePassword=False)
+	result = {}
+	for pos,(myHash,theirHash) in enumerate(zip(mine,theirs)):
+		if myHash == theirHash:
+			continue
+		row = rowAt(multi,pos)
+		otherRow = rowAt(other,pos)
+		if isinstance(row,param.Param) and isinstance(otherRow,param.Param):
+			result[str(pos)] = diff(row,otherRow)
+		else:
+			result[str(pos)] = diffJSON(multi,rowValues(row),rowValues(otherRow))
+	return result
+
+def diffJSON(schema,values,other):
+	result = {}
+	for item in schema.items:
+		value = values.get(item.id)
+		otherValue = other.get(item.id)
+		if value == otherValue:
+			continue
+		if isinstance(item,param.ParamMulti) and isinstance(value,list) and isinstance(otherValue,list) and len(value) == len(otherValue):
+			result[item.id] = dict((str(pos),diffJSON(item,row,otherRow)) for pos,(row,otherRow) in enumerate(zip(value,otherValue)) if row != otherRow)
+		elif isinstance(item,param.Param) and not isinstance(item,param.ParamMulti) and isinstance(value,dict) and isinstance(otherValue,dict):
+			result[item.id] = diffJSON(item,value,otherValue)
+		else:
+			result[item.id] = otherValue
+	return result
+
+def rowAt(multi,pos):
+	rows = multi.values
+	if isinstance(rows,param.LazyRows):
+		return rows.entries[pos]
+	if isinstance(rows,param.ColumnStore) and pos not in rows.rows:
+		return rows.rowValues(pos,hidePassword=False)
+	return rows[pos]
+
+def rowValues(row):
+	if isinstance(row,dict):
+		return row
+	return row.getValues(hidePassword=False)
+
+def patch(item,changes):
+	"""
+		Apply a patch returned by ``diff`` to ``item``, through
+		``Param.update``: every value is checked before any is applied.
+	"""
+	updates = []
+	patchChanges(item,changes,'',updates)
+	item.update(updates)
+
+def patchChanges(schema,changes,path,updates):
+	if not isinstance(changes,dict):
+		raise ParamExceptions.WrongValue('401',str(changes) + ' not correct for ' + str(schema.id))
+	for key,value in changes.items():
+		pos = schema.layout.get(str(key))
+		if pos is None:
+			raise ParamExceptions.WrongValue('403',str(key) + ' not correct for ' + str(schema.id))
+		item = schema.items[pos]
+		subpath = item.id if path == '' else path + '.' + item.id
+		if isinstance(item,param.ParamMulti) and isinstance(value,dict):
+			for index,rowChanges in value.items():
+				patchChanges(item,rowChanges,'{0}[{1}]'.format(subpath,str(int(index))),updates)
+		elif isinstance(item,param.Param) and not isinstance(item,param.ParamMulti):
+			patchChanges(item,value,subpath,updates)
+		else:
+			updates.append((subpath,value))
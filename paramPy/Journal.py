@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import os
+import json
+import hashlib
+import param
+import Path
+
+##############
+## Journal
+##############
+# One JSON record per line, in the file <values file>.journal:
+#   {"op": "base", "sha1": ..., "files": ...}    sha1 of the values file the records apply to, and
+#                                                of each shard file by path of the shard ("files",
+#                                                only with shards)
+#   {"op": "set", "path": ..., "value": ...}     setValue of the ConfigElement at path
+#   {"op": "add", "path": ..., "value": ...}     value set added to the ParamMulti at path
+#   {"op": "del", "path": ..., "index": ...}     value set removed from the ParamMulti at path
+#   {"op": "rows", "path": ..., "value": ...}    all value sets of the ParamMulti at path replaced
+# An empty path is the journaled Param itself. A record is only replayed if
+# the file holding its path still has the sha1 of the base: compacting
+# rewrites the files one at a time, and a file already rewritten holds its
+# records.
+class Journal(object):
+	"""
+		The ``Journal`` class
+		=====================
+
+		Append-only log of the changes made to a Param since its values file
+		was last written. Changes are appended as they are made, instead of
+		rewriting the values file; ``loadFromFile`` replays them on top of
+		the values file, and the log is compacted into a new values file
+		once it holds more than ``threshold`` records (or on ``saveToFile``).
+
+		Changes the log can't locate in the tree (edits of 'shared' value
+		sets) compact it right away.
+
+		:param item: Param with a filename
+		:type item: Param
+
+		:param sync: fsync the log after each record
+		:type sync: bool
+	"""
+	def __init__(self,item,threshold=1000,sync=False):
+		if item.filename is None:
+			raise AttributeError("No filename provided")
+		self.item = item
+		self.threshold = threshold
+		self.sync = sync
+		self.count = 0
+		self.paused = False
+		self.file = None
+
+	def __str__(self):
+		return '<Journal {0} ({1} records)>'.format(self.filename(),str(self.count))
+
+	def __repr__(self):
+		return str(self)
+
+	def filename(self):
+		return self.item.filename + '.journal'
+
+	def append(self,record):
+		if self.file is None:
+			if not os.path.exists(self.filename()):
+				# no base to apply the record to: the new values file holds the change
+				self.compact()
+				return
+			self.file = open(self.filename(),'ab')
+		self.file.write(json.dumps(record,separators=(',',':')) + '\n')
+		self.file.flush()
+		if self.sync:
+			os.fsync(self.file.fileno())
+		self.count += 1
+		if self.count > self.threshold:
+			self.compact()
+
+	def __getstate__(self):
+		state = dict(self.__dict__)
+		state['file'] = None
+		return state
+
+	def close(self):
+		if self.file is not None:
+			self.file.close()
+			self.file = None
+
+	# Recording
+	def record(self,node,key):
+		if self.paused:
+			return
+		if isinstance(node,param.ParamRow):
+			self.recordRow(node,key)
+			return
+		if isinstance(node,param.ParamMulti):
+			# status of a value set: its changes have records of their own
+			return
+		item = node[key]
+		if isinstance(item,param.Param):
+			return
+		path = self.pathOf(node)
+		if path is None:
+			self.compact()
+			return
+		self.append({'op':'set','path':Journal.join(path,item.id),'value':item.value})
+
+	def recordRow(self,row,key):
+		# a shared value set is located through its ParamMulti, the value
+		# sets nested in it have no link to their own
+		multi = row.schema
+		item = multi[key]
+		path = self.pathOf(multi) if isinstance(multi,param.ParamMulti) else None
+		index = None if path is None else Journal.rowIndex(multi,row)
+		if index is None or isinstance(item,param.Param):
+			self.compact()
+			return
+		self.append({'op':'set','path':Journal.join('{0}[{1}]'.format(path,str(index)),item.id),'value':row[key]})
+
+	def recordRows(self,multi,op,value=None):
+		if self.paused:
+			return
+		path = self.pathOf(multi)
+		if path is None:
+			self.compact()
+		elif op == 'add':
+			if not isinstance(value,dict):
+				value = value.getValues(hidePassword=False)
+			self.append({'op':'add','path':path,'value':value})
+		elif op == 'del':
+			self.append({'op':'del','path':path,'index':value})
+		else:
+			self.append({'op':'rows','path':path,'value':multi.getValues(hidePassword=False)})
+
+	@staticmethod
+	def join(path,id):
+		return id if path == '' else path + '.' + id
+
+	def pathOf(self,node):
+		steps = []
+		while node is not self.item:
+			parent = node.parent
+			if parent is None:
+				return None
+			if isinstance(parent,param.ParamMulti):
+				index = Journal.rowIndex(parent,node)
+				if index is None:
+					return None
+				steps.append('[{0}]'.format(str(index)))
+			else:
+				steps.append(node.id)
+			node = parent
+		path = ''
+		for step in reversed(steps):
+			path += step if step[0] == '[' or path == '' else '.' + step
+		return path
+
+	@staticmethod
+	def rowIndex(multi,row):
+		rows = multi.values
+		if isinstance(rows,param.RowStore):
+			return rows.positionOf(row)
+		cache = multi.indexCache
+		if cache is None:
+			cache = multi.buildIndexes()
+		return cache.positionOf(row)
+
+	# Loading and compaction
+	def load(self,stream=False,progress=None):
+		self.close()
+		self.paused = True
+		try:
+			self.item.readFile(self.item.filename,stream,progress)
+			digests = self.digests()
+			self.count,complete = self.replay(digests)
+			if self.count is None:
+				self.reset(digests)
+			elif not complete:
+				# interrupted compaction: the records of the files it had
+				# rewritten were skipped, write everything again
+				self.compact()
+		finally:
+			self.paused = False
+
+	def digests(self):
+		result = {}
+		for path,filename in self.item.valueFiles(self.item.filename):
+			try:
+				with open(filename,'rb') as data_file:
+					result[path] = hashlib.sha1(data_file.read()).hexdigest()
+			except IOError:
+				result[path] = None
+		return result
+
+	@staticmethod
+	def owner(paths,path):
+		for key in paths:
+			if key == '' or path == key or path.startswith(key + '.') or path.startswith(key + '['):
+				return key
+		return ''
+
+	def read(self,digests):
+		"""
+			Records of the journal file to replay on files with these
+			digests, as (records, number of records, whether every file
+			matched its base, end of the last whole record), or None when no
+			file matches (the journal is not about these files).
+		"""
+		if not os.path.exists(self.filename()):
+			return None
+		records = []
+		count = 0
+		end = 0
+		stale = set()
+		paths = ['']
+		with open(self.filename(),'rb') as journal_file:
+			for line in journal_file:
+				if not line.endswith('\n'):
+					break
+				end += len(line)
+				record = json.loads(line)
+				if record['op'] == 'base':
+					bases = dict(record.get('files',{}))
+					bases[''] = record['sha1']
+					stale = set(path for path,digest in bases.items() if digests.get(path) != digest)
+					if len(stale) == len(bases):
+						return None
+					paths = sorted(bases,key=len,reverse=True)
+					continue
+				count += 1
+				if len(stale)>0 and Journal.owner(paths,record['path']) in stale:
+					continue
+				records.append(record)
+		return records,count,len(stale) == 0,end
+
+	def replay(self,digests):
+		"""
+			Apply the records of the journal file to the tree and return
+			(number of records, whether every file matched its base), or
+			(None,False) when no file matches.
+		"""
+		read = self.read(digests)
+		if read is None:
+			return None,False
+		records,count,complete,end = read
+		if end < os.path.getsize(self.filename()):
+			# torn last record (crash while appending): drop it, or the next
+			# record would be written on the same line
+			with open(self.filename(),'r+b') as journal_file:
+				journal_file.truncate(end)
+		for record in records:
+			self.apply(record)
+		return count,complete
+
+	def reset(self,digests):
+		self.close()
+		record = {'op':'base','sha1':digests['']}
+		if len(digests)>1:
+			record['files'] = dict((path,digest) for path,digest in digests.items() if path != '')
+		param.atomicWrite(self.filename(),json.dumps(record) + '\n')
+		self.count = 0
+
+	def apply(self,record):
+		op = record['op']
+		if op == 'set':
+			self.item.update([(record['path'],record['value'])])
+			return
+		node = self.item
+		if record['path'] != '':
+			compiled = Path.compilePath(record['path'])
+			root,version,plan,leaf = compiled.bind(self.item)
+			for kind,arg in plan:
+				node = Path.Path.step(node,kind,arg)
+		if op == 'add':
+			node.addRow(record['value'])
+		elif op == 'del':
+			node.removeRow(record['index'])
+		else:
+			node.loadValuesFromJSON({node.id:record['value']})
+
+	def compact(self):
+		self.close()
+		paused = self.paused
+		self.paused = True
+		try:
+			self.item.writeFile(self.item.filename)
+			self.reset(self.digests())
+		finally:
+			self.paused = paused
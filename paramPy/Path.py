@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import re
+import param
+
+KEY = 0
+INDEX = 1
+ALL = 2
+TOKEN = re.compile(r"\.?([^.\[\]]+)|\[(\d+|\*)\]")
+CACHE_SIZE = 1024
+
+##############
+## Path
+##############
+class Path(object):
+	"""
+		The ``Path`` class
+		==================
+
+		Compiled accessor for a value of a Param tree, written like
+		``tracker[3].login.user``: ids are separated by dots and value sets
+		of a ParamMulti are selected with ``[index]``, or all of them with
+		``[*]``.
+
+		The positions of the ids are resolved against the schema of each
+		Param the path is used on, kept on that Param (so compiled paths
+		don't keep trees alive) and resolved again only when its schema
+		changes.
+
+		``get`` returns a single value, or a generator over the values of
+		every selected value set when the path holds a ``[*]``. Passwords
+		are hidden unless ``hidePassword`` is False. The value sets of
+		'columnar' and 'lazy' ParamMulti are read from their columns and
+		JSON entries, without being materialised.
+
+		:param path: path to the value
+		:type path: string
+	"""
+	def __init__(self,path):
+		self.path = path
+		self.steps = Path.parse(path)
+		self.wildcard = any(kind == ALL for kind,arg in self.steps)
+
+	def __str__(self):
+		return '<Path {0}>'.format(self.path)
+
+	def __repr__(self):
+		return str(self)
+
+	@staticmethod
+	def parse(path):
+		steps = []
+		pos = 0
+		while pos < len(path):
+			match = TOKEN.match(path,pos)
+			if match is None:
+				raise ValueError("Incorrect path {0} at character {1}".format(path,str(pos)))
+			if match.group(1) is not None:
+				if (pos == 0) == (path[pos] == '.'):
+					raise ValueError("Incorrect path {0} at character {1}".format(path,str(pos)))
+				steps.append((KEY,match.group(1)))
+			elif match.group(2) == '*':
+				steps.append((ALL,None))
+			else:
+				steps.append((INDEX,int(match.group(2))))
+			pos = match.end()
+		if len(steps) == 0:
+			raise ValueError("Empty path")
+		return steps
+
+	def bind(self,item):
+		bindings = item.bindings
+		if bindings is None:
+			bindings = item.bindings = {}
+		binding = bindings.get(self.path)
+		if binding is not None and binding[1] == item.schemaVersion:
+			return binding
+		plan = []
+		node = item
+		row = False
+		for kind,arg in self.steps:
+			if kind == KEY:
+				if not isinstance(node,param.Param) or (isinstance(node,param.ParamMulti) and not row):
+					raise IndexError("{0}: {1} has no item {2}".format(self.path,str(node.id),arg))
+				pos = node.layout.get(arg)
+				if pos is None:
+					raise IndexError("{0}: {1} has no item {2}".format(self.path,str(node.id),arg))
+				plan.append((KEY,pos))
+				node = node.items[pos]
+				row = False
+			else:
+				if not isinstance(node,param.ParamMulti) or row:
+					raise IndexError("{0}: {1} has no value sets".format(self.path,str(node.id)))
+				plan.append((kind,arg))
+				row = True
+		binding = (item,item.schemaVersion,plan,node)
+		if len(bindings) >= CACHE_SIZE:
+			bindings.clear()
+		bindings[self.path] = binding
+		return binding
+
+	def get(self,item,hidePassword=True):
+		item,version,plan,leaf = self.bind(item)
+		if self.wildcard:
+			return self.iterate(item,item,plan,0,leaf,hidePassword)
+		node = schema = item
+		for kind,arg in plan:
+			node,schema = Path.read(node,schema,kind,arg)
+		return Path.export(node,leaf,hidePassword)
+
+	def iterate(self,node,schema,plan,start,leaf,hidePassword=True):
+		for pos in xrange(start,len(plan)):
+			kind,arg = plan[pos]
+			if kind == ALL:
+				rows = node.values if isinstance(node,param.ParamMulti) else node
+				for index in xrange(len(rows)):
+					row,rowSchema = Path.read(node,schema,INDEX,index)
+					for value in self.iterate(row,rowSchema,plan,pos+1,leaf,hidePassword):
+						yield value
+				return
+			node,schema = Path.read(node,schema,kind,arg)
+		yield Path.export(node,leaf,hidePassword)
+
+	@staticmethod
+	def step(node,kind,arg):
+		if kind == KEY:
+			if isinstance(node,param.Param):
+				return node.items[arg]
+			return node.data[arg]
+		rows = node.values if isinstance(node,param.ParamMulti) else node
+		return rows[arg]
+
+	@staticmethod
+	def read(node,schema,kind,arg):
+		# step of get: ``schema`` describes node, which is a JSON value
+		# once read from the value sets of a store
+		if kind == KEY:
+			schema = schema.items[arg]
+			if isinstance(node,dict):
+				return node.get(schema.id),schema
+			return Path.step(node,kind,arg),schema
+		rows = node.values if isinstance(node,param.ParamMulti) else node
+		if isinstance(rows,param.LazyRows):
+			return rows.entries[arg],schema
+		if isinstance(rows,param.ColumnStore):
+			return rows.rowValues(arg,hidePassword=False),schema
+		return rows[arg],schema
+
+	@staticmethod
+	def export(node,leaf,hidePassword=True):
+		if isinstance(node,param.ConfigElement):
+			return node.getValues(hidePassword)
+		if isinstance(node,(param.Param,param.ParamRow)):
+			return node.getValues(hidePassword)
+		if isinstance(node,dict):
+			return param.LazyRows.exportRow(leaf,node,hidePassword)
+		if isinstance(leaf,param.ParamMulti):
+			return leaf.exportRows(node,hidePassword)
+		if hidePassword and isinstance(leaf,param.ConfigElement) and leaf.type == 'password':
+			return '****'
+		return param.LazyRows.copyJSON(node)
+
+paths = {}
+
+def compilePath(path):
+	compiled = paths.get(path)
+	if compiled is None:
+		compiled = Path(path)
+		if len(paths) >= CACHE_SIZE:
+			paths.clear()
+		paths[path] = compiled
+	return compiled
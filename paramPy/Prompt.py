@@ -2,8 +2,12 @@
 #encoding:utf-8
 
 import sys
+import bisect
 import getpass
 
+PAGE_SIZE = 20
+PAGED_THRESHOLD = 50
+
 ##############
 ## PromptSimple
 ##############
@@ -99,20 +103,21 @@ def promptMulti(question,choix=[],password=False,mandatory=False):
 	reponse = None
 	result = []
 	warning = ''
+	if isinstance(choix,list):
+		mydict = {}
+		for i,j in enumerate(choix):
+			mydict.update({i:j})
+	else:
+		mydict = choix
+	index = ChoiceIndex(mydict) if len(mydict) > PAGED_THRESHOLD else None
 	while reponse != '':
 		if len(result)>0:
 			selected = "Already entered: " + str(result) + "\n"
 		else:
 			selected = ""
 		if len(choix)>0:
-			if isinstance(choix,list):
-				mydict = {}
-				for i,j in enumerate(choix):
-					mydict.update({i:j})
-			else:
-				mydict = choix
 			str_question = question + ' (Press "Enter" to achieve entry)' if len(result) > 0 or not mandatory else question
-			reponse = promptChoice(str_question,warning=warning,selected=result,choix=mydict,mandatory=(mandatory and len(result)<1),default=None,multi=True)
+			reponse = promptChoice(str_question,warning=warning,selected=result,choix=mydict,mandatory=(mandatory and len(result)<1),default=None,multi=True,index=index)
 			if reponse is None:
 				reponse = ''
 			else:
@@ -141,7 +146,7 @@ def print_question(str_question,warning='',result=[]):
 	if warning != '':
 		print warning
 	
-def promptChoice(question,choix,warning='',selected=[],default = None,mandatory=False,multi=False):
+def promptChoice(question,choix,warning='',selected=[],default = None,mandatory=False,multi=False,index=None):
 	"""
 		The ``promptChoice`` function
 		=============================
@@ -157,6 +162,11 @@ def promptChoice(question,choix,warning='',selected=[],default = None,mandatory=
 		:param default: Index of the default choice (0 by default, ie. the first choice)
 		:type choix: Integer
 
+		:param index: ChoiceIndex of choix, to reuse between calls. Above
+			PAGED_THRESHOLD choices, the list is shown by pages and can be
+			filtered (see promptPaged)
+		:type index: ChoiceIndex
+
 		:return: Index of the choice
 		:rtype: Integer
 
@@ -173,13 +183,17 @@ def promptChoice(question,choix,warning='',selected=[],default = None,mandatory=
 		34
 		
 	"""
+	if index is None and len(choix) > PAGED_THRESHOLD:
+		index = ChoiceIndex(choix)
+	if index is not None:
+		return promptPaged(question,index,warning=warning,selected=selected,default=default,mandatory=mandatory,multi=multi)
 	str_is_selected = 	'[SELECTED]'
 	str_not_selected = 	'[        ]'
 	choix = sorted(choix.items())
+	width = len(max([i[1] for i in choix], key=len))
 	warning = ''
 	while True:	
 		str_choices = ''
-		width = len(max([i[1] for i in choix], key=len))
 		
 		if default is None and not mandatory:
 			str_question = "{0} [keep blank for none]".format(str(question))
@@ -210,6 +224,132 @@ def promptChoice(question,choix,warning='',selected=[],default = None,mandatory=
 		else:
 			return choix[int(reponse)-1][0]
 			
+##############
+## Paged choices
+##############
+class ChoiceIndex(object):
+	"""
+		The ``ChoiceIndex`` class
+		=========================
+
+		Choices of a prompt, sorted and padded once, with a sorted index of
+		the lowercased words of their labels: the choices matching a typed
+		prefix are a range of the index, found by bisection, and a longer
+		prefix is searched within the range of the previous one.
+
+		:param choix: choices, as given to promptChoice
+		:type choix: dict
+	"""
+	def __init__(self,choix):
+		self.choices = sorted(choix.items())
+		width = len(max([label for key,label in self.choices], key=len)) if len(self.choices)>0 else 0
+		self.lines = [("{0:" + str(width) + "}").format(label) for key,label in self.choices]
+		words = set()
+		for pos,(key,label) in enumerate(self.choices):
+			label = str(label).lower()
+			words.add((label,pos))
+			for word in label.split():
+				words.add((word,pos))
+		words = sorted(words)
+		self.words = [word for word,pos in words]
+		self.positions = [pos for word,pos in words]
+
+	def __len__(self):
+		return len(self.choices)
+
+	def narrow(self,text,bounds=None):
+		low,high = bounds if bounds is not None else (0,len(self.words))
+		text = text.lower()
+		low = bisect.bisect_left(self.words,text,low,high)
+		end = low
+		while end < high and self.words[end].startswith(text):
+			end += 1
+		return low,end
+
+	def matches(self,bounds):
+		return sorted(set(self.positions[bounds[0]:bounds[1]]))
+
+def promptPaged(question,index,warning='',selected=[],default=None,mandatory=False,multi=False):
+	"""
+		The ``promptPaged`` function
+		============================
+
+		promptChoice for long lists: choices are shown PAGE_SIZE at a time,
+		'>' and '<' change page, any other text (or '/text', to filter on
+		digits) keeps the choices having a word starting with it and '/'
+		alone shows all of them again. Choices are numbered in the
+		filtered list.
+
+		:param index: choices to show
+		:type index: ChoiceIndex
+
+		:return: Index of the choice
+		:rtype: Integer
+	"""
+	str_is_selected = 	'[SELECTED]'
+	str_not_selected = 	'[        ]'
+	text = ''
+	bounds = None
+	positions = range(len(index))
+	page = 0
+	if default is None and not mandatory:
+		str_question = "{0} [keep blank for none]".format(str(question))
+	else:
+		str_question = question
+	for key,label in index.choices:
+		if default is not None and str(key) == str(default):
+			str_question = "{0} [{1} by default]".format(str(question),str(label))
+	while True:
+		pages = max(1,(len(positions) + PAGE_SIZE - 1) // PAGE_SIZE)
+		page = max(0,min(page,pages-1))
+		first = page * PAGE_SIZE
+		width = len(str(len(positions)))
+		str_choices = "Page {0}/{1}, {2} choices{3}\n".format(str(page+1),str(pages),str(len(positions))," starting with '{0}'".format(text) if text != '' else '')
+		for rank,pos in enumerate(positions[first:first+PAGE_SIZE]):
+			if multi:
+				str_selected = str_is_selected if index.choices[pos][0] in selected else str_not_selected
+			else:
+				str_selected = ''
+			str_choices += ("{0:" + str(width) + "}: {1} {2}\n").format(str(first+rank+1),index.lines[pos],str_selected)
+		str_choices += "('>' next page, '<' previous page, text to filter, '/' all choices)\n"
+		print_question(str_question,warning)
+		print str_choices,
+		warning = ''
+		reponse = prompt()
+		if reponse == '':
+			if default is not None:
+				return default
+			if mandatory and len(selected) < 1:
+				warning = "Mandatory answer"
+			else:
+				return None
+		elif reponse == '>':
+			page += 1
+		elif reponse == '<':
+			page -= 1
+		elif reponse == '/':
+			text = ''
+			bounds = None
+			positions = range(len(index))
+			page = 0
+		elif reponse.isdigit():
+			if int(reponse) < 1 or int(reponse) > len(positions):
+				warning = "Incorrect answer"
+			else:
+				return index.choices[positions[int(reponse)-1]][0]
+		else:
+			filter = reponse[1:] if reponse[0] == '/' else reponse
+			narrowing = text != '' and filter.lower().startswith(text.lower())
+			newbounds = index.narrow(filter,bounds if narrowing else None)
+			matches = index.matches(newbounds)
+			if len(matches) == 0:
+				warning = "No choice starting with '{0}'".format(filter)
+			else:
+				text = filter
+				bounds = newbounds
+				positions = matches
+				page = 0
+
 def prompt(password=False):
 	invite = "> "
 	try:
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import os
+import json
+import urllib
+import urlparse
+import binascii
+import threading
+import BaseHTTPServer
+import param
+import Path
+import ParamExceptions
+import Concurrent
+
+CACHE_SIZE = 256
+
+##############
+## Server
+##############
+class Server(object):
+	"""
+		The ``Server`` class
+		====================
+
+		Maintain a Param over HTTP (stdlib only)::
+
+			GET  /schema[/<path>]    toJSON of the tree, or of the item at path
+			GET  /values[/<path>]    values of the tree, or at path (passwords hidden)
+			PUT  /values/<path>      set the value at path to the JSON body
+			POST /values             apply a JSON object of {path: value} changes
+
+		Paths are written as for ``Param.get``. Changes go through
+		``Param.update``: they are all applied or none is.
+
+		Responses are cached per path and reused until the Param holding
+		the value changes (or the schema, for /schema). Every response has
+		an ETag; a request whose If-None-Match matches it is answered 304
+		without serialising anything.
+
+		Requests are handled one at a time. To change the tree from other
+		threads while it is served, serve a ConcurrentParam.
+
+		:param item: tree to serve
+		:type item: Param or ConcurrentParam
+
+		:param save: call saveToFile after each change
+		:type save: bool
+	"""
+	def __init__(self,item,host='127.0.0.1',port=8080,save=False,verbose=False):
+		if not isinstance(item,(param.Param,Concurrent.ConcurrentParam)):
+			raise TypeError("Server only accepts Param or ConcurrentParam, not " + str(type(item)))
+		self.item = item
+		self.save = save
+		self.verbose = verbose
+		self.cache = {}
+		self.token = binascii.hexlify(os.urandom(4))
+		self.serial = 0
+		self.thread = None
+		self.httpd = BaseHTTPServer.HTTPServer((host,port),Handler)
+		self.httpd.api = self
+
+	def __str__(self):
+		return '<Server {0} (http://{1}:{2})>'.format(self.root().id,self.address[0],str(self.address[1]))
+
+	def __repr__(self):
+		return str(self)
+
+	@property
+	def address(self):
+		return self.httpd.server_address
+
+	def root(self):
+		if isinstance(self.item,Concurrent.ConcurrentParam):
+			return self.item.snapshot()
+		return self.item
+
+	# Reading
+	def read(self,kind,path):
+		root = self.root()
+		node,stamp = Server.locate(root,kind,path)
+		# the stamp is kept with the response (see param.markDirty)
+		param.newEpoch()
+		key = (kind,path)
+		entry = self.cache.get(key)
+		if entry is not None and entry[0] is node and entry[1] == stamp:
+			return entry[2],entry[3]
+		if kind == 'schema':
+			value = node.exportSchema() if isinstance(node,param.Param) else node.toJSON()
+		elif path == '':
+			value = root.exportValues(hidePassword=True)
+		else:
+			value = root.get(path,hidePassword=True)
+			if Path.compilePath(path).wildcard:
+				value = list(value)
+		body = json.dumps(value,ensure_ascii=False)
+		if isinstance(body,unicode):
+			body = body.encode('utf-8')
+		if entry is not None and entry[3] == body:
+			# same content from a copied tree (ConcurrentParam): keep the ETag
+			etag = entry[2]
+		else:
+			self.serial += 1
+			etag = '"{0}-{1}"'.format(self.token,str(self.serial))
+		if len(self.cache) >= CACHE_SIZE:
+			self.cache.clear()
+		self.cache[key] = (node,stamp,etag,body)
+		return etag,body
+
+	@staticmethod
+	def locate(root,kind,path):
+		"""
+			Return the node a cached response depends on and its current
+			stamp: the schema item and the schema version of the tree for
+			/schema, the deepest Param on the path and its version for
+			/values (the ParamMulti, for value sets of a store).
+		"""
+		if path == '':
+			return root,(root.schemaVersion if kind == 'schema' else root.version)
+		item,version,plan,leaf = Path.compilePath(path).bind(root)
+		if kind == 'schema':
+			return leaf,root.schemaVersion
+		node = owner = root
+		for step,arg in plan:
+			if step == Path.ALL:
+				break
+			if isinstance(node,param.ParamMulti) and isinstance(node.values,param.RowStore):
+				# value sets of the stores are read without being
+				# materialised: their ParamMulti changes with them
+				break
+			node = Path.Path.step(node,step,arg)
+			if isinstance(node,param.Param):
+				owner = node
+		return owner,owner.version
+
+	# Writing
+	def change(self,changes):
+		self.item.update(changes)
+		if self.save:
+			self.item.saveToFile()
+
+	# Running
+	def serve(self):
+		self.httpd.serve_forever()
+
+	def start(self):
+		if self.thread is not None and self.thread.is_alive():
+			return self
+		self.thread = threading.Thread(target=self.serve,name='Server-' + self.root().id)
+		self.thread.daemon = True
+		self.thread.start()
+		return self
+
+	def stop(self):
+		if self.thread is not None:
+			self.httpd.shutdown()
+			self.thread.join()
+			self.thread = None
+		self.httpd.server_close()
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+	server_version = 'paramPy'
+
+	def route(self):
+		path = urlparse.urlsplit(self.path).path.lstrip('/')
+		parts = path.split('/',1)
+		if parts[0] not in ['schema','values']:
+			raise KeyError(parts[0])
+		return parts[0],urllib.unquote(parts[1]) if len(parts)>1 else ''
+
+	def body(self):
+		length = int(self.headers.getheader('Content-Length',0))
+		return json.loads(self.rfile.read(length))
+
+	def reply(self,code,body=None,etag=None):
+		self.send_response(code)
+		if etag is not None:
+			self.send_header('ETag',etag)
+			self.send_header('Cache-Control','no-cache')
+		if body is not None:
+			self.send_header('Content-Type','application/json; charset=utf-8')
+		self.send_header('Content-Length',str(len(body)) if body is not None else '0')
+		self.end_headers()
+		if body is not None:
+			self.wfile.write(body)
+
+	def error(self,code,e):
+		self.reply(code,json.dumps({'error':str(e)}))
+
+	def dispatch(self,method):
+		try:
+			method()
+		except (KeyError,IndexError), e:
+			self.error(404,e)
+		except ParamExceptions.IdAlreadyUsed, e:
+			self.error(409,e)
+		except (ValueError,TypeError,ParamExceptions.WrongValue), e:
+			self.error(400,e)
+
+	def get(self):
+		kind,path = self.route()
+		etag,body = self.server.api.read(kind,path)
+		match = self.headers.getheader('If-None-Match')
+		if match is not None and (match.strip() == '*' or etag in [tag.strip() for tag in match.split(',')]):
+			self.reply(304,etag=etag)
+		else:
+			self.reply(200,body,etag)
+
+	def put(self):
+		kind,path = self.route()
+		if kind != 'values' or path == '':
+			self.error(405,'PUT only on /values/<path>')
+			return
+		self.server.api.change([(path,self.body())])
+		self.reply(204)
+
+	def post(self):
+		kind,path = self.route()
+		if kind != 'values' or path != '':
+			self.error(405,'POST only on /values')
+			return
+		changes = self.body()
+		if not isinstance(changes,dict):
+			raise ValueError('POST /values expects an object of {path: value}')
+		self.server.api.change(changes)
+		self.reply(204)
+
+	def do_GET(self):
+		self.dispatch(self.get)
+
+	def do_PUT(self):
+		self.dispatch(self.put)
+
+	def do_POST(self):
+		self.dispatch(self.post)
+
+	def log_message(self,format,*args):
+		if self.server.api.verbose:
+			BaseHTTPServer.BaseHTTPRequestHandler.log_message(self,format,*args)
+
+def serve(item,host='127.0.0.1',port=8080,save=False):
+	return Server(item,host,port,save).start()
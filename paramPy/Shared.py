@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import os
+import mmap
+import json
+import struct
+import param
+import Path
+
+# File layout (little endian):
+#   header   magic, format, generation, entry count, keys offset, values offset
+#   entries  one per node, sorted by path: key offset/length, value offset/length, kind
+#   keys     utf-8 paths, as accepted by Param.get ('tracker[0].login.user')
+#   values   JSON of each ConfigElement value, number of value sets of each
+#            ParamMulti, empty for Params
+MAGIC = 'PPSH'
+FORMAT = 1
+HEADER = struct.Struct('<4sIQIQQ')
+ENTRY = struct.Struct('<IIIIB')
+GENERATION = struct.Struct('<Q')
+
+VALUE = 0
+PASSWORD = 1
+PARAM = 2
+MULTI = 3
+
+##############
+## Publisher
+##############
+def publish(item,filename):
+	"""
+		Write the values of ``item`` to ``filename`` for the workers
+		attached to it (see ``SharedParam``) and return the new generation.
+		The file is replaced atomically, then the generation counter kept
+		in ``filename``.gen is bumped in place so workers pick it up.
+	"""
+	entries = []
+	collect(item,item.exportValues(hidePassword=False),'',entries)
+	entries.sort()
+	generation = readGeneration(filename) + 1
+	index = []
+	keys = []
+	values = []
+	keysSize = valuesSize = 0
+	for key,kind,value in entries:
+		index.append(ENTRY.pack(keysSize,len(key),valuesSize,len(value),kind))
+		keys.append(key)
+		values.append(value)
+		keysSize += len(key)
+		valuesSize += len(value)
+	keysOffset = HEADER.size + ENTRY.size * len(entries)
+	header = HEADER.pack(MAGIC,FORMAT,generation,len(entries),keysOffset,keysOffset + keysSize)
+	param.atomicWrite(filename,header + ''.join(index) + ''.join(keys) + ''.join(values))
+	writeGeneration(filename,generation)
+	return generation
+
+def collect(schema,values,path,entries):
+	if isinstance(schema,param.ParamMulti):
+		values = values if isinstance(values,list) else []
+		entries.append((path.encode('utf-8'),MULTI,str(len(values))))
+		for pos,row in enumerate(values):
+			collectItems(schema,row,'{0}[{1}]'.format(path,str(pos)),entries)
+	elif isinstance(schema,param.Param):
+		if path != '':
+			entries.append((path.encode('utf-8'),PARAM,''))
+		collectItems(schema,values,path,entries)
+	else:
+		kind = PASSWORD if schema.type == 'password' else VALUE
+		entries.append((path.encode('utf-8'),kind,json.dumps(values)))
+
+def collectItems(schema,values,path,entries):
+	if path != '' and path[-1] == ']':
+		entries.append((path.encode('utf-8'),PARAM,''))
+	for item in schema.items:
+		collect(item,values.get(item.id) if isinstance(values,dict) else None,item.id if path == '' else path + '.' + item.id,entries)
+
+def generationFile(filename):
+	return filename + '.gen'
+
+def readGeneration(filename):
+	try:
+		with open(generationFile(filename),'rb') as infile:
+			return GENERATION.unpack(infile.read(GENERATION.size))[0]
+	except (IOError,struct.error):
+		return 0
+
+def writeGeneration(filename,generation):
+	name = generationFile(filename)
+	if not os.path.exists(name):
+		param.atomicWrite(name,GENERATION.pack(generation))
+		return
+	with open(name,'r+b') as outfile:
+		counter = mmap.mmap(outfile.fileno(),GENERATION.size)
+		counter[0:GENERATION.size] = GENERATION.pack(generation)
+		counter.close()
+
+##############
+## SharedParam
+##############
+class SharedParam(object):
+	"""
+		The ``SharedParam`` class
+		=========================
+
+		Read-only access to the values written by ``publish``, for worker
+		processes. The file is mapped in memory and values are looked up in
+		place (binary search on the paths): the pages are shared by every
+		process mapping the file, and nothing is loaded up front.
+
+		Before each lookup the generation counter is checked (a read of 8
+		bytes of a mapped file) and the newest file is mapped if it moved;
+		set ``autoRefresh`` to False to only switch on ``refresh``.
+
+		:param filename: file given to publish
+		:type filename: string
+	"""
+	def __init__(self,filename,autoRefresh=True):
+		self.filename = filename
+		self.autoRefresh = autoRefresh
+		self.data = None
+		self.generation = None
+		with open(generationFile(filename),'rb') as infile:
+			self.counter = mmap.mmap(infile.fileno(),GENERATION.size,access=mmap.ACCESS_READ)
+		self.open()
+
+	def __str__(self):
+		return '<SharedParam {0} (Generation:{1}, {2} entries)>'.format(self.filename,str(self.generation),str(self.count))
+
+	def __repr__(self):
+		return str(self)
+
+	def open(self):
+		with open(self.filename,'rb') as infile:
+			data = mmap.mmap(infile.fileno(),0,access=mmap.ACCESS_READ)
+		magic,format,generation,count,keysOffset,valuesOffset = HEADER.unpack_from(data,0)
+		if magic != MAGIC or format != FORMAT:
+			data.close()
+			raise ValueError(self.filename + ' is not a paramPy shared file')
+		if self.data is not None:
+			self.data.close()
+		self.data = data
+		self.generation = generation
+		self.count = count
+		self.keysOffset = keysOffset
+		self.valuesOffset = valuesOffset
+
+	def refresh(self):
+		if GENERATION.unpack_from(self.counter,0)[0] == self.generation:
+			return False
+		self.open()
+		return True
+
+	def close(self):
+		if self.data is not None:
+			self.data.close()
+			self.data = None
+		self.counter.close()
+
+	# Lookups
+	def entry(self,pos):
+		keyOffset,keyLength,valueOffset,valueLength,kind = ENTRY.unpack_from(self.data,HEADER.size + ENTRY.size * pos)
+		start = self.keysOffset + keyOffset
+		return self.data[start:start+keyLength],kind,valueOffset,valueLength
+
+	def find(self,key):
+		low,high = 0,self.count
+		while low < high:
+			middle = (low + high) // 2
+			if self.entry(middle)[0] < key:
+				low = middle + 1
+			else:
+				high = middle
+		return low
+
+	def value(self,kind,valueOffset,valueLength,hidePassword):
+		if kind == PARAM:
+			return {}
+		if kind == PASSWORD and hidePassword:
+			return '****'
+		start = self.valuesOffset + valueOffset
+		content = self.data[start:start+valueLength]
+		if kind == MULTI:
+			return [None] * int(content)
+		return json.loads(content)
+
+	def get(self,path='',hidePassword=True):
+		if self.autoRefresh:
+			self.refresh()
+		key = path.encode('utf-8')
+		if key == '':
+			return self.assemble('',0,hidePassword,{})
+		pos = self.find(key)
+		if pos >= self.count:
+			raise IndexError('{0} not found in {1}'.format(path,self.filename))
+		found,kind,valueOffset,valueLength = self.entry(pos)
+		if found != key:
+			raise IndexError('{0} not found in {1}'.format(path,self.filename))
+		value = self.value(kind,valueOffset,valueLength,hidePassword)
+		if kind in (PARAM,MULTI):
+			return self.assemble(key,pos+1,hidePassword,value)
+		return value
+
+	def getValues(self,hidePassword=True):
+		return self.get('',hidePassword)
+
+	def assemble(self,prefix,pos,hidePassword,result):
+		# the entries below prefix follow it, parents before their children
+		for pos in xrange(pos,self.count):
+			key,kind,valueOffset,valueLength = self.entry(pos)
+			if prefix != '':
+				if not key.startswith(prefix) or key[len(prefix)] not in '.[':
+					if key > prefix + '[':
+						break
+					continue
+				relative = key[len(prefix):].lstrip('.')
+			else:
+				relative = key
+			steps = Path.Path.parse(relative.decode('utf-8'))
+			node = result
+			for step,arg in steps[:-1]:
+				node = node[arg]
+			node[steps[-1][1]] = self.value(kind,valueOffset,valueLength,hidePassword)
+		return result
+
+def attach(filename,autoRefresh=True):
+	return SharedParam(filename,autoRefresh)
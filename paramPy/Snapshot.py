@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import os
+import json
+import mmap
+import struct
+import hashlib
+import cPickle
+import param
+
+##############
+## Snapshot
+##############
+# Layout: fixed size header, the stamps of the values files, then the
+# pickled Param tree.
+#   magic       4s   'PPYS'
+#   version     H    snapshot format version
+#   reserved    H
+#   schema      20s  sha1 of the schema JSON and of the class layout
+#   stamps      Q    length of the stamps
+#   length      Q    length of the payload
+# The stamps are a JSON list of [file, mtime, size] for the values file
+# then each shard file, relative to the directory of the values file
+# (mtime 0 and size -1 for a missing file). They can be checked on a
+# read-only mmap of the file before the payload is touched. Snapshots are
+# pickles: only load trusted files.
+# The class layout is the __slots__ of the pickled classes, so a snapshot
+# written before one of them changed is ignored; bump VERSION for changes
+# the slots don't show (pickled state, classes without slots).
+MAGIC = 'PPYS'
+VERSION = 3
+HEADER = struct.Struct('<4sHH20sQQ')
+PICKLED = ('ConfigMeta','ConfigElement','Param','ParamMulti','ParamRow','RowList')
+
+def classLayout():
+	return json.dumps([(name,list(getattr(param,name).__slots__)) for name in PICKLED])
+
+def schemaDigest(json_schema):
+	digest = hashlib.sha1(classLayout())
+	digest.update(json.dumps(json_schema,sort_keys=True,separators=(',',':')))
+	return digest.digest()
+
+def valuesStamp(filename):
+	if filename is None or not os.path.exists(filename):
+		return 0.0,-1
+	stat = os.stat(filename)
+	return stat.st_mtime,stat.st_size
+
+def valuesStamps(item):
+	if item.filename is None:
+		return [['',0.0,-1]]
+	directory = os.path.dirname(os.path.abspath(item.filename))
+	stamps = []
+	for path,name in item.valueFiles(item.filename):
+		mtime,size = valuesStamp(name)
+		stamps.append([os.path.relpath(os.path.abspath(name),directory),mtime,size])
+	return stamps
+
+def upToDate(stamps,valuesFile):
+	directory = os.path.dirname(os.path.abspath(valuesFile))
+	for pos,(name,mtime,size) in enumerate(stamps):
+		current = valuesStamp(valuesFile if pos == 0 else os.path.join(directory,name))
+		if current != (mtime,size):
+			return False
+	return True
+
+def saveSnapshot(item,filename,json_schema=None):
+	if json_schema is None:
+		json_schema = item.toJSON()
+	stamps = json.dumps(valuesStamps(item))
+	payload = cPickle.dumps(item,cPickle.HIGHEST_PROTOCOL)
+	header = HEADER.pack(MAGIC,VERSION,0,schemaDigest(json_schema),len(stamps),len(payload))
+	param.atomicWrite(filename,header + stamps + payload)
+
+def loadSnapshot(filename,json_schema,valuesFile=None):
+	"""
+		The ``loadSnapshot`` function
+		=============================
+
+		Load the Param tree saved in a snapshot file, without validating the
+		schema or the values again.
+
+		:param json_schema: schema JSON the snapshot must have been built from
+		:type json_schema: dict
+
+		:param valuesFile: values file the snapshot must be up to date with,
+			shard files included
+		:type valuesFile: string
+
+		:return: the Param, or None if the snapshot is missing, from another
+			format version, class layout or schema, older than the values,
+			or can't be unpickled
+		:rtype: Param
+	"""
+	if not os.path.exists(filename) or os.path.getsize(filename) < HEADER.size:
+		return None
+	with open(filename,'rb') as data_file:
+		content = mmap.mmap(data_file.fileno(),0,access=mmap.ACCESS_READ)
+		try:
+			magic,version,reserved,digest,stampsLength,length = HEADER.unpack(content[:HEADER.size])
+			if magic != MAGIC or version != VERSION or digest != schemaDigest(json_schema):
+				return None
+			start = HEADER.size + stampsLength
+			if start + length > len(content):
+				return None
+			if valuesFile is not None and not upToDate(json.loads(content[HEADER.size:start]),valuesFile):
+				return None
+			try:
+				return cPickle.loads(content[start:start+length])
+			except Exception:
+				# written by another version of the classes: load from JSON
+				return None
+		finally:
+			content.close()
+
+def ParamFromSnapshot(filename,json_schema,valuesFile=None):
+	item = loadSnapshot(filename,json_schema,valuesFile)
+	if item is not None:
+		return item
+	if json_schema.get('type') == 'ParamMulti':
+		item = param.ParamMultiFromJSON(json_schema)
+	else:
+		item = param.ParamFromJSON(json_schema)
+	if valuesFile is not None:
+		item.loadFromFile(valuesFile)
+	saveSnapshot(item,filename,json_schema)
+	return item
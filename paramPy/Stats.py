@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import sys
+import json
+import time
+import types
+import threading
+
+##############
+## Instrumentation
+##############
+# Nothing is measured until ``enable`` is called: it replaces the methods
+# below by timed wrappers, ``disable`` puts the original methods back.
+# Nested calls of the same category (a deep copy copying its items, a status
+# depending on other statuses) are counted, but only the outermost call is
+# timed. Values are checked and cast in one compiled plan: 'validate' covers
+# both, 'convert' the columns of 'columnar' value sets converted at once.
+TARGETS = [
+	('param','ConfigElement','validateSingle','validate'),
+	('param','ConfigElement','validate','validate'),
+	('param','ConfigElement','checkValue','validate'),
+	('param','ColumnStore','convertColumn','convert'),
+	('param','Param','getStatus','status'),
+	('param','ParamRow','getStatus','status'),
+	('param','ConfigElement','__deepcopy__','deepcopy'),
+	('param','Param','__deepcopy__','deepcopy'),
+	('param','ParamMulti','__deepcopy__','deepcopy'),
+	('param','ParamRow','__deepcopy__','deepcopy'),
+	('param','Param','loadFromFile','load'),
+	('param','Param','saveToFile','save'),
+	('Stream','JSONStream','readValue','parse')
+	]
+JSON_CATEGORIES = {'load':'parse','loads':'parse','dump':'serialize','dumps':'serialize'}
+JSON_MODULES = ['param','Stream','Journal','Watcher','Snapshot','Server']
+
+LOCK = threading.Lock()
+LOCAL = threading.local()
+counters = {}
+callback = None
+originals = []
+
+def record(category,seconds):
+	with LOCK:
+		counter = counters.get(category)
+		if counter is None:
+			counter = counters[category] = {'count':0,'seconds':0.0}
+		counter['count'] += 1
+		if seconds is not None:
+			counter['seconds'] += seconds
+	if callback is not None and seconds is not None:
+		callback(category,seconds)
+
+def timed(function,category):
+	def wrapper(*args,**kwargs):
+		depths = getattr(LOCAL,'depths',None)
+		if depths is None:
+			depths = LOCAL.depths = {}
+		depth = depths.get(category,0)
+		depths[category] = depth + 1
+		start = time.time()
+		try:
+			return function(*args,**kwargs)
+		finally:
+			depths[category] = depth
+			record(category,time.time() - start if depth == 0 else None)
+	wrapper.__name__ = function.__name__
+	wrapper.__doc__ = function.__doc__
+	return wrapper
+
+class JSONProxy(object):
+	"""
+		Stands for the json module in the instrumented modules, timing
+		load(s) as 'parse' and dump(s) as 'serialize'.
+	"""
+	def __init__(self):
+		for name,category in JSON_CATEGORIES.items():
+			setattr(self,name,timed(getattr(json,name),category))
+
+	def __getattr__(self,name):
+		return getattr(json,name)
+
+def isEnabled():
+	return len(originals)>0
+
+def enable(hook=None):
+	"""
+		Start measuring. ``hook`` is called as hook(category,seconds) after
+		each outermost measured call, e.g. to forward it to a metrics system.
+	"""
+	global callback
+	callback = hook
+	if isEnabled():
+		return
+	import param
+	import Stream
+	import Journal
+	import Watcher
+	import Snapshot
+	import Server
+	modules = {'param':param,'Stream':Stream,'Journal':Journal,'Watcher':Watcher,'Snapshot':Snapshot,'Server':Server}
+	for module,cls,name,category in TARGETS:
+		owner = getattr(modules[module],cls)
+		original = owner.__dict__[name]
+		originals.append((owner,name,original))
+		if isinstance(original,staticmethod):
+			setattr(owner,name,staticmethod(timed(original.__func__,category)))
+		else:
+			setattr(owner,name,timed(original,category))
+	proxy = JSONProxy()
+	for name in JSON_MODULES:
+		originals.append((modules[name],'json',modules[name].json))
+		modules[name].json = proxy
+
+def disable():
+	global callback
+	while len(originals)>0:
+		owner,name,original = originals.pop()
+		setattr(owner,name,original)
+	callback = None
+
+def reset():
+	with LOCK:
+		counters.clear()
+
+def snapshot():
+	with LOCK:
+		return dict((category,dict(counter)) for category,counter in counters.items())
+
+##############
+## Footprint
+##############
+SKIP = (type,types.ModuleType,types.BuiltinFunctionType,types.MethodType)
+
+def deepSize(obj,seen):
+	"""
+		Approximate size in bytes of the objects reachable from ``obj`` that
+		are not in ``seen`` (a set of ids, updated).
+	"""
+	size = 0
+	todo = [obj]
+	while len(todo)>0:
+		obj = todo.pop()
+		if id(obj) in seen or isinstance(obj,SKIP):
+			continue
+		seen.add(id(obj))
+		size += sys.getsizeof(obj)
+		if isinstance(obj,dict):
+			todo.extend(obj.keys())
+			todo.extend(obj.values())
+		elif isinstance(obj,(list,tuple,set,frozenset)):
+			todo.extend(obj)
+		elif isinstance(obj,types.FunctionType):
+			todo.extend(cell.cell_contents for cell in (obj.func_closure or ()))
+		else:
+			if hasattr(obj,'__dict__'):
+				todo.append(obj.__dict__)
+			for cls in type(obj).__mro__:
+				for name in cls.__dict__.get('__slots__',()):
+					if name != 'parent' and hasattr(obj,name):
+						todo.append(getattr(obj,name))
+	return size
+
+def footprint(item,seen=None):
+	"""
+		Approximate memory used by each Param of the tree: bytes counts the
+		whole subtree, objects shared between subtrees are counted once, in
+		the first subtree they are found in.
+	"""
+	import param
+	if seen is None:
+		seen = set()
+	children = [footprint(child,seen) for child in item.items if isinstance(child,param.Param)]
+	size = deepSize(item,seen) + sum(child['bytes'] for child in children)
+	return {'id':item.id,'bytes':size,'items':children}
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import re
+import json
+import json.scanner
+
+WHITESPACE = ' \t\n\r'
+# longest literal a value can be cut in ('-Infinity')
+TAIL = 9
+DECODE_ERROR = re.compile(r'(.*?): line \d+ column \d+ \(char (\d+)\)$')
+
+##############
+## JSONStream
+##############
+class JSONStream(object):
+	"""
+		The ``JSONStream`` class
+		========================
+
+		Incremental reader over a JSON file: containers are walked with
+		``iterObject`` / ``iterArray`` and only the values actually read with
+		``readValue`` are held in memory.
+
+		:param fileobj: file opened for reading
+		:type fileobj: file
+
+		:param progress: called as progress(count,position) after each applied value
+		:type progress: callable
+	"""
+	def __init__(self,fileobj,chunkSize=65536,progress=None):
+		self.file = fileobj
+		self.chunkSize = chunkSize
+		self.progress = progress
+		self.decoder = json.JSONDecoder()
+		# the C scanner does not locate errors inside containers: the
+		# Python one is run again on the failed value to find where it broke
+		self.checker = json.JSONDecoder()
+		self.checker.scan_once = json.scanner.py_make_scanner(self.checker)
+		self.buffer = ''
+		self.pos = 0
+		self.offset = 0
+		self.eof = False
+		self.count = 0
+
+	def position(self):
+		return self.offset + self.pos
+
+	def fill(self,size=None):
+		if self.eof:
+			return False
+		if self.pos > 0:
+			self.offset += self.pos
+			self.buffer = self.buffer[self.pos:]
+			self.pos = 0
+		chunk = self.file.read(max(size or 0,self.chunkSize))
+		if len(chunk) == 0:
+			self.eof = True
+			return False
+		self.buffer += chunk
+		return True
+
+	def peek(self):
+		while True:
+			while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+				self.pos += 1
+			if self.pos < len(self.buffer):
+				return self.buffer[self.pos]
+			if not self.fill():
+				return ''
+
+	def expect(self,char):
+		if self.peek() != char:
+			raise ValueError("Expecting '{0}' at byte {1}".format(char,str(self.position())))
+		self.pos += 1
+
+	def readValue(self):
+		self.peek()
+		while True:
+			try:
+				value,end = self.decoder.raw_decode(self.buffer,self.pos)
+			except ValueError:
+				reason,pos = self.decodeError()
+				position = self.offset + pos
+				# only a value cut by the end of the buffer is read further
+				if (reason.startswith('Unterminated string') or pos + TAIL >= len(self.buffer)) and self.fill(len(self.buffer)):
+					continue
+				raise ValueError("{0} at byte {1}".format(reason,str(position)))
+			if end == len(self.buffer) and not self.eof and self.fill(len(self.buffer)):
+				continue
+			self.pos = end
+			return value
+
+	def decodeError(self):
+		try:
+			self.checker.raw_decode(self.buffer,self.pos)
+		except ValueError, e:
+			match = DECODE_ERROR.match(str(e))
+			if match is not None:
+				return match.group(1),int(match.group(2))
+			if str(e).startswith('end is out of bounds'):
+				# string opened on the last byte of the buffer
+				return str(e),len(self.buffer)
+			return str(e),self.pos
+		return 'No JSON object could be decoded',self.pos
+
+	def iterContainer(self,start,stop):
+		self.expect(start)
+		if self.peek() == stop:
+			self.pos += 1
+			return
+		while True:
+			yield
+			char = self.peek()
+			self.pos += 1
+			if char == stop:
+				return
+			if char != ',':
+				raise ValueError("Expecting ',' or '{0}' at byte {1}".format(stop,str(self.position()-1)))
+
+	def iterObject(self):
+		for none in self.iterContainer('{','}'):
+			if self.peek() != '"':
+				raise ValueError("Expecting property name at byte {0}".format(str(self.position())))
+			key = self.readValue()
+			self.expect(':')
+			yield key
+
+	def iterArray(self):
+		return self.iterContainer('[',']')
+
+	def applied(self):
+		self.count += 1
+		if self.progress is not None:
+			self.progress(self.count,self.position())
+
+	def end(self):
+		if self.peek() != '':
+			raise ValueError("Extra data at byte {0}".format(str(self.position())))
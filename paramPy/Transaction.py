@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import param
+import Path
+import ParamExceptions
+
+##############
+## Transaction
+##############
+class Transaction(object):
+	"""
+		The ``Transaction`` class
+		=========================
+
+		Stage changes to a Param tree and apply them all at once, or none of
+		them. Used as a context manager, the changes are committed when the
+		block ends normally and dropped when it raises::
+
+			with conf.transaction() as transaction:
+				transaction['tracker[0].login.user'] = 'admin'
+				transaction['email_enabled'] = True
+
+		:param item: Param the paths are relative to
+		:type item: Param
+	"""
+	def __init__(self,item):
+		self.item = item
+		self.changes = []
+
+	def __str__(self):
+		return '<Transaction {0} ({1} changes)>'.format(self.item.id,str(len(self.changes)))
+
+	def __repr__(self):
+		return str(self)
+
+	def __len__(self):
+		return len(self.changes)
+
+	def set(self,path,value):
+		self.changes.append((path,value))
+
+	__setitem__ = set
+
+	def commit(self):
+		changes = self.changes
+		self.changes = []
+		update(self.item,changes)
+
+	def rollback(self):
+		self.changes = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,type,value,traceback):
+		if type is None:
+			self.commit()
+		else:
+			self.rollback()
+		return False
+
+def update(item,changes):
+	"""
+		Apply ``changes`` (a dict, or a list of (path,value) pairs, paths as
+		accepted by ``Param.get``) to ``item``. Every value is validated
+		before the tree is touched; if one is wrong, the exception is raised
+		and nothing changes. Statuses are recomputed once per changed Param.
+	"""
+	if isinstance(changes,dict):
+		changes = changes.items()
+	staged = []
+	for path,value in changes:
+		stage(item,path,value,staged)
+	undo = []
+	try:
+		for target,key,value in staged:
+			if isinstance(target,param.ConfigElement):
+				undo.append((target,key,target.current))
+				target.current = value
+			elif isinstance(target,param.ParamRow):
+				undo.append((target,key,target.data[key]))
+				target.data[key] = value
+			else:
+				undo.append((target,key,target.values))
+				target.values = value
+		notify(undo)
+		for multi in indexed(undo):
+			multi.checkUnique()
+	except:
+		for target,key,value in reversed(undo):
+			if isinstance(target,param.ConfigElement):
+				target.current = value
+			elif isinstance(target,param.ParamRow):
+				target.data[key] = value
+			else:
+				target.values = value
+		notify(undo)
+		raise
+	journal = item.getRoot().journal
+	if journal is not None:
+		for target,key,value in staged:
+			if isinstance(target,param.ConfigElement):
+				if target.parent is not None:
+					journal.record(target.parent,target.id)
+			elif isinstance(target,param.ParamRow):
+				journal.record(target,key)
+
+def notify(applied):
+	nodes = {}
+	for target,key,value in applied:
+		if isinstance(target,param.ConfigElement):
+			node = target.parent
+		elif isinstance(target,param.ParamRow):
+			node = target.schema
+		else:
+			node = target
+		if node is not None:
+			nodes[id(node)] = node
+	for node in nodes.values():
+		node.statusChanged()
+		node.markDirty()
+		node.valueChanged()
+	for target,key,value in applied:
+		if isinstance(target,param.ParamRow) and isinstance(target.schema,param.ParamMulti):
+			target.schema.rowEdited(target)
+
+def indexed(applied):
+	"""
+		ParamMulti with unique indexes holding a changed value.
+	"""
+	nodes = {}
+	for target,key,value in applied:
+		node = target.schema if isinstance(target,param.ParamRow) else target
+		while node is not None:
+			if isinstance(node,param.ParamMulti) and node.hasUnique():
+				nodes[id(node)] = node
+			node = node.parent
+	return nodes.values()
+
+def stage(item,path,value,staged):
+	compiled = Path.compilePath(path)
+	if compiled.wildcard:
+		raise ValueError("Wildcards can't be updated: " + path)
+	root,version,plan,leaf = compiled.bind(item)
+	node = root
+	for kind,arg in plan[:-1]:
+		node = Path.Path.step(node,kind,arg)
+	kind,arg = plan[-1]
+	if kind != Path.KEY or (isinstance(leaf,param.Param) and not isinstance(leaf,param.ParamMulti)):
+		if not isinstance(value,dict):
+			raise ParamExceptions.WrongValue('401',str(value) + ' not correct for ' + path)
+		for key,subvalue in value.items():
+			stage(item,path + '.' + str(key),subvalue,staged)
+		return
+	if isinstance(node,param.ParamRow):
+		staged.append((node,arg,param.ParamRow.loadValue(leaf,value)))
+		return
+	target = node.items[arg]
+	if isinstance(target,param.ParamMulti):
+		staged.append((target,None,target.loadRows(value)))
+	else:
+		staged.append((target,None,target.checkValue(value)))
@@ -9,10 +9,58 @@ class Trigger(dict):
 				raise TypeError("Trigger parameter must be a dict with str values only not " + str(value))
 	
 	def __getitem__(self,key):
-		if key not in self.keys():
-			if '*' in self.keys():
+		if not dict.__contains__(self,key):
+			if dict.__contains__(self,'*'):
 				return dict.__getitem__(self,'*')
 			else:
 				return ''
 		else:
 			return dict.__getitem__(self,key)
+
+class TriggerGraph(object):
+	"""
+		The ``TriggerGraph`` class
+		==========================
+		
+		Compiled form of a Param trigger list. Nodes are the item ids of the
+		Param plus ``None`` for the Param itself ('self' in the trigger list),
+		edges go from ``src_id`` to ``dst_id``.
+
+		A rule reads the status of its source item itself, never the status
+		the rules give it: only the status of the Param ('self') is computed
+		from other rules. Rules can't loop (a -> b with b -> a is valid), and
+		a change only reaches the destinations of the changed item, plus the
+		destinations of 'self' when the item is a source of the Param status.
+		
+		:param trigger: list of dicts with src_id, src_status, dst_id and dst_status keys
+		:type trigger: list
+	"""
+	KEYS = ['src_id','src_status','dst_id','dst_status']
+
+	def __init__(self,trigger):
+		self.trigger = trigger
+		self.selfRules = []
+		self.rulesByDst = {}
+		self.downstream = {}
+		self.affectedCache = {}
+		for trig in trigger:
+			if not isinstance(trig,dict) or not all(x in trig.keys() for x in self.KEYS):
+				continue
+			src = None if trig['src_id'] == 'self' else trig['src_id']
+			dst = None if trig['dst_id'] == 'self' else trig['dst_id']
+			if dst is None:
+				if src is not None:
+					self.selfRules.append((src,trig['src_status'],trig['dst_status']))
+					self.downstream.setdefault(src,set()).add(None)
+			else:
+				self.rulesByDst.setdefault(dst,[]).append((trig['src_id'],trig['src_status'],trig['dst_status']))
+				self.downstream.setdefault(src,set()).add(dst)
+
+	def affected(self,key):
+		if key not in self.affectedCache:
+			result = set([key])
+			result.update(self.downstream.get(key,()))
+			if None in result:
+				result.update(self.downstream.get(None,()))
+			self.affectedCache[key] = result
+		return self.affectedCache[key]
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import collections
+import param
+
+##############
+## Views
+##############
+# Read-only facades over the live values of a tree, returned by view().
+# A Param (or value set) reads as a Mapping, a ParamMulti (or a list
+# value) as a Sequence, in the shapes getValues returns; nothing is
+# copied, every access reads the current value. json.dumps only accepts
+# real dicts and lists: use getValues to serialise.
+
+def wrap(item,value,hidePassword,hideDisabled):
+	if isinstance(item,param.ParamMulti):
+		return RowsView(item,value,hidePassword,hideDisabled)
+	if isinstance(value,param.Param):
+		return ParamView(value,hidePassword,hideDisabled)
+	if isinstance(item,param.Param):
+		return RowView(item,value,hidePassword,hideDisabled)
+	if hidePassword and item is not None and item.type == 'password':
+		return '****'
+	if isinstance(value,list):
+		return ListView(value)
+	return value
+
+class ParamView(collections.Mapping):
+	"""
+		The ``ParamView`` class
+		=======================
+
+		Read-only Mapping over the values of a Param, as ``getValues``
+		returns them. Passwords read as '****' when ``hidePassword`` is
+		set; ids whose status is 'disabled' are left out when
+		``hideDisabled`` is set.
+
+		:param node: viewed Param
+		:type node: Param
+	"""
+	def __init__(self,node,hidePassword=True,hideDisabled=False):
+		self.node = node
+		self.hidePassword = hidePassword
+		self.hideDisabled = hideDisabled
+
+	def __repr__(self):
+		return repr(dict(self.items()))
+
+	def hidden(self,id):
+		return self.hideDisabled and self.node.getStatus(id) == 'disabled'
+
+	def __getitem__(self,key):
+		pos = self.node.layout.get(key)
+		if pos is None or self.hidden(key):
+			raise KeyError(key)
+		item = self.node.items[pos]
+		if isinstance(item,param.ParamMulti):
+			return RowsView(item,None,self.hidePassword,self.hideDisabled)
+		if isinstance(item,param.Param):
+			return ParamView(item,self.hidePassword,self.hideDisabled)
+		return wrap(item,item.value,self.hidePassword,self.hideDisabled)
+
+	def __iter__(self):
+		for item in self.node.items:
+			if not self.hidden(item.id):
+				yield item.id
+
+	def __len__(self):
+		return sum(1 for id in self)
+
+class RowView(collections.Mapping):
+	"""
+		The ``RowView`` class
+		=====================
+
+		Read-only Mapping over a value set not stored as a Param: a
+		ParamRow ('shared' and 'columnar' storage) or a JSON dict not
+		materialised yet ('lazy' storage).
+
+		:param schema: Param describing the value set
+		:type schema: Param
+
+		:param row: viewed value set
+		:type row: ParamRow or dict
+	"""
+	def __init__(self,schema,row,hidePassword=True,hideDisabled=False):
+		self.schema = schema
+		self.row = row
+		self.hidePassword = hidePassword
+		self.hideDisabled = hideDisabled
+
+	def __repr__(self):
+		return repr(dict(self.items()))
+
+	def __getitem__(self,key):
+		pos = self.schema.layout.get(key)
+		item = self.schema.items[pos] if pos is not None else None
+		if isinstance(self.row,dict):
+			return wrap(item,self.row[key],self.hidePassword,self.hideDisabled)
+		if pos is None or (self.hideDisabled and self.row.getStatus(key) == 'disabled'):
+			raise KeyError(key)
+		return wrap(item,self.row.data[pos],self.hidePassword,self.hideDisabled)
+
+	def __iter__(self):
+		if isinstance(self.row,dict):
+			return iter(self.row)
+		return (item.id for item in self.schema.items if not self.hideDisabled or self.row.getStatus(item.id) != 'disabled')
+
+	def __len__(self):
+		if isinstance(self.row,dict):
+			return len(self.row)
+		return sum(1 for id in self)
+
+class ColumnView(collections.Mapping):
+	"""
+		The ``ColumnView`` class
+		========================
+
+		Read-only Mapping over a value set of a ColumnStore, read straight
+		from its columns.
+
+		:param store: columns of the 'columnar' ParamMulti
+		:type store: ColumnStore
+
+		:param index: position of the value set
+		:type index: int
+	"""
+	def __init__(self,store,index,schema,prefix=(),hidePassword=True):
+		self.store = store
+		self.index = index
+		self.schema = schema
+		self.prefix = prefix
+		self.hidePassword = hidePassword
+
+	def __repr__(self):
+		return repr(dict(self.items()))
+
+	def __getitem__(self,key):
+		pos = self.schema.layout.get(key)
+		if pos is None:
+			raise KeyError(key)
+		item = self.schema.items[pos]
+		path = self.prefix + (item.id,)
+		if isinstance(item,param.Param) and not isinstance(item,param.ParamMulti):
+			return ColumnView(self.store,self.index,item,path,self.hidePassword)
+		for (columnPath,columnItem),column in zip(self.store.layout,self.store.columns):
+			if columnPath == path:
+				return wrap(item,column[self.index],self.hidePassword,False)
+		raise KeyError(key)
+
+	def __iter__(self):
+		return (item.id for item in self.schema.items)
+
+	def __len__(self):
+		return len(self.schema.items)
+
+class SequenceView(collections.Sequence):
+	def __repr__(self):
+		return repr(list(self))
+
+	def __eq__(self,other):
+		if isinstance(other,basestring) or not isinstance(other,collections.Sequence):
+			return NotImplemented
+		return len(self) == len(other) and all(mine == theirs for mine,theirs in zip(self,other))
+
+	def __ne__(self,other):
+		equal = self.__eq__(other)
+		return equal if equal is NotImplemented else not equal
+
+	__hash__ = None
+
+class RowsView(SequenceView):
+	"""
+		The ``RowsView`` class
+		======================
+
+		Read-only Sequence over the value sets of a ParamMulti, whatever
+		its storage. With ``hideDisabled``, triggers of 'columnar' and
+		'lazy' value sets are only evaluated on materialised rows, so
+		those are materialised when read.
+
+		:param schema: viewed ParamMulti
+		:type schema: ParamMulti
+
+		:param rows: value sets of a nested ParamMulti, held by a value set not
+			stored as a Param; None for ``schema.values``, read on each access
+		:type rows: list, ColumnStore or LazyRows
+	"""
+	def __init__(self,schema,rows=None,hidePassword=True,hideDisabled=False):
+		self.schema = schema
+		self.nested = rows
+		self.hidePassword = hidePassword
+		self.hideDisabled = hideDisabled
+
+	@property
+	def rows(self):
+		return self.schema.values if self.nested is None else self.nested
+
+	def __len__(self):
+		return len(self.rows)
+
+	def __getitem__(self,index):
+		if isinstance(index,slice):
+			return [self[pos] for pos in xrange(*index.indices(len(self)))]
+		rows = self.rows
+		if index < 0:
+			index += len(rows)
+		if index < 0 or index >= len(rows):
+			raise IndexError("list index out of range")
+		if isinstance(rows,param.ColumnStore):
+			if index not in rows.rows and not self.hideDisabled:
+				return ColumnView(rows,index,self.schema,(),self.hidePassword)
+			row = rows[index]
+		elif isinstance(rows,param.LazyRows) and not self.hideDisabled:
+			row = rows.entries[index]
+		else:
+			row = rows[index]
+		if isinstance(row,param.Param):
+			return ParamView(row,self.hidePassword,self.hideDisabled)
+		return RowView(self.schema,row,self.hidePassword,self.hideDisabled)
+
+class ListView(SequenceView):
+	"""
+		Read-only Sequence over a list value of a ConfigElement.
+	"""
+	def __init__(self,values):
+		self.values = values
+
+	def __len__(self):
+		return len(self.values)
+
+	def __getitem__(self,index):
+		return self.values[index]
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+#encoding:utf-8
+
+import os
+import json
+import time
+import threading
+import param
+import Path
+import ParamExceptions
+
+##############
+## Watcher
+##############
+class Watcher(object):
+	"""
+		The ``Watcher`` class
+		=====================
+
+		Reload the values of a Param when its files change: its file, the
+		files of its shards and its journal when it has one. They are polled
+		(modification time and size) and only reloaded once they have stayed
+		unchanged for ``debounce`` seconds.
+
+		A reload parses the files as plain JSON (shard files in place,
+		journal records applied on top), compares them with the values of
+		the tree and applies the values that changed through
+		``Param.update``: value sets are changed in place, unless their
+		number changed. Only the changed values are checked, all of them
+		before any is applied (unique indexes included): if the files are
+		not valid the tree is left untouched and the error is kept in
+		``error``.
+
+		``poll`` never blocks and can be called from any loop; ``start`` runs
+		it in a daemon thread every ``interval`` seconds. The tree is read
+		and changed while holding ``lock``: other threads using the tree
+		while the Watcher runs must hold it too (give the lock they already
+		use). The callback is called after the lock is released.
+
+		:param item: Param with a filename
+		:type item: Param
+
+		:param callback: called as callback(item,paths) after each applied
+			reload, with the paths (as for ``Param.get``) of the changed values
+		:type callback: callable
+
+		:param lock: lock guarding the tree, a new RLock by default
+		:type lock: threading.Lock or threading.RLock
+	"""
+	def __init__(self,item,interval=1.0,debounce=0.5,callback=None,lock=None):
+		if item.filename is None:
+			raise AttributeError("No filename provided")
+		self.item = item
+		self.lock = threading.RLock() if lock is None else lock
+		self.interval = interval
+		self.debounce = debounce
+		self.callback = callback
+		self.stamp = self.stamps()
+		self.pending = None
+		self.pendingSince = None
+		self.error = None
+		self.thread = None
+		self.stopped = threading.Event()
+
+	def __str__(self):
+		return '<Watcher {0} ({1})>'.format(self.item.id,self.item.filename)
+
+	def __repr__(self):
+		return str(self)
+
+	@staticmethod
+	def fileStamp(filename):
+		try:
+			stat = os.stat(filename)
+		except OSError:
+			return None
+		return stat.st_mtime,stat.st_size
+
+	@staticmethod
+	def files(item,filename):
+		return [name for path,name in item.valueFiles(filename)]
+
+	def stamps(self):
+		names = Watcher.files(self.item,self.item.filename)
+		if self.item.journal is not None:
+			names.append(self.item.journal.filename())
+		return tuple(Watcher.fileStamp(name) for name in names)
+
+	def poll(self,now=None):
+		now = time.time() if now is None else now
+		stamp = self.stamps()
+		if stamp == self.stamp or stamp[0] is None:
+			self.pending = None
+			return False
+		if stamp != self.pending:
+			self.pending = stamp
+			self.pendingSince = now
+			return False
+		if now - self.pendingSince < self.debounce:
+			return False
+		self.stamp = stamp
+		self.pending = None
+		return self.reload()
+
+	@staticmethod
+	def readValues(item,filename):
+		with open(filename) as data_file:
+			content = json.load(data_file)
+		shards = item.shards()
+		if len(shards)>0 and not isinstance(content,dict):
+			raise ParamExceptions.WrongValue('401',str(content) + ' not correct for ' + str(item.id))
+		for shard in shards:
+			path = item.shardFilename(filename,shard)
+			if not os.path.exists(path):
+				continue
+			values = Watcher.readValues(shard,path)
+			if isinstance(content.get(shard.id),dict) and isinstance(values,dict):
+				content[shard.id].update(values)
+			else:
+				content[shard.id] = values
+		return content
+
+	def read(self):
+		"""
+			Values of the files as plain JSON and the journal records to
+			apply on top of them.
+		"""
+		content = Watcher.readValues(self.item,self.item.filename)
+		journal = self.item.journal
+		records = []
+		if journal is not None:
+			read = journal.read(journal.digests())
+			if read is not None:
+				records = read[0]
+		return content,records
+
+	def reload(self):
+		try:
+			content,records = self.read()
+		except (IOError,ValueError), e:
+			self.error = e
+			return False
+		with self.lock:
+			journal = self.item.journal
+			if journal is not None:
+				# the changes are already on disk: don't record them again, and
+				# reopen the journal file in case it was replaced
+				journal.close()
+				paused = journal.paused
+				journal.paused = True
+			try:
+				exported = self.item.exportValues(hidePassword=False)
+				for record in records:
+					content = Watcher.applyRecord(content,exported,record)
+				changes = []
+				Watcher.diff(self.item,content,exported,'',changes)
+				if len(changes) == 1 and changes[0][0] == '':
+					# the whole value sets of a watched ParamMulti
+					rows = self.item.loadRows(changes[0][1])
+					if self.item.hasUnique():
+						self.item.checkUnique(rows)
+					self.item.setRows(rows)
+				else:
+					self.item.update(changes)
+			except (ValueError,IndexError,KeyError,TypeError,ParamExceptions.WrongValue,ParamExceptions.IdAlreadyUsed), e:
+				self.error = e
+				return False
+			finally:
+				if journal is not None:
+					journal.paused = paused
+			self.error = None
+		if self.callback is not None and len(changes)>0:
+			self.callback(self.item,[path for path,value in changes])
+		return len(changes)>0
+
+	@staticmethod
+	def applyRecord(content,exported,record):
+		"""
+			Apply a journal record to the JSON values ``content`` and return
+			them. Values missing from the files are those of the tree
+			(``exported``), copied before being changed.
+		"""
+		steps = Path.Path.parse(record['path']) if record['path'] != '' else []
+		op = record['op']
+		if op == 'set':
+			parent = Watcher.locate(content,exported,steps[:-1])
+			parent[steps[-1][1]] = record['value']
+			return content
+		if op == 'rows':
+			if len(steps) == 0:
+				return record['value']
+			parent = Watcher.locate(content,exported,steps[:-1])
+			parent[steps[-1][1]] = record['value']
+			return content
+		rows = Watcher.locate(content,exported,steps)
+		if not isinstance(rows,list):
+			raise ValueError("Journal record {0} does not match the values file".format(record['path']))
+		if op == 'add':
+			rows.append(record['value'])
+		else:
+			del rows[record['index']]
+		return content
+
+	@staticmethod
+	def locate(node,exported,steps):
+		for kind,arg in steps:
+			if kind == Path.KEY and isinstance(node,dict) and arg not in node:
+				node[arg] = param.LazyRows.copyJSON(exported[arg])
+			node = node[arg]
+			try:
+				exported = exported[arg]
+			except (KeyError,IndexError,TypeError):
+				exported = None
+		return node
+
+	@staticmethod
+	def join(path,id):
+		return id if path == '' else path + '.' + id
+
+	@staticmethod
+	def diff(item,json,exported,prefix,changes):
+		"""
+			Append to ``changes`` the (path,value) pairs, for Param.update,
+			of the values of ``json`` that differ from ``exported``.
+		"""
+		if json == exported:
+			return
+		if isinstance(item,param.ParamMulti):
+			if not isinstance(json,list) or not isinstance(exported,list) or len(json) != len(exported):
+				changes.append((prefix,json))
+				return
+			for pos,(row,current) in enumerate(zip(json,exported)):
+				Watcher.diffItems(item,row,current,'{0}[{1}]'.format(prefix,str(pos)),changes)
+			return
+		Watcher.diffItems(item,json,exported,prefix,changes)
+
+	@staticmethod
+	def diffItems(item,json,exported,prefix,changes):
+		if json == exported:
+			return
+		if not isinstance(json,dict):
+			raise ParamExceptions.WrongValue('401',str(json) + ' not correct for ' + str(item.id))
+		for key,value in json.items():
+			pos = item.layout.get(str(key))
+			if pos is None:
+				raise ParamExceptions.WrongValue('403',str(key) + ' not correct for ' + str(item.id))
+			it = item.items[pos]
+			current = exported.get(it.id) if isinstance(exported,dict) else None
+			if isinstance(it,param.Param):
+				Watcher.diff(it,value,current,Watcher.join(prefix,it.id),changes)
+			elif value != current:
+				changes.append((Watcher.join(prefix,it.id),value))
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			self.poll()
+
+	def start(self):
+		if self.thread is not None and self.thread.is_alive():
+			return self
+		self.stopped.clear()
+		self.thread = threading.Thread(target=self.run,name='Watcher-' + self.item.id)
+		self.thread.daemon = True
+		self.thread.start()
+		return self
+
+	def stop(self):
+		self.stopped.set()
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+
+def watch(item,interval=1.0,debounce=0.5,callback=None,lock=None):
+	return Watcher(item,interval,debounce,callback,lock).start()
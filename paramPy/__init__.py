@@ -1,4 +1,4 @@
-__all__ = ['param','Trigger']
+__all__ = ['param','Trigger','Snapshot','Concurrent','Watcher','Stats','Path','Transaction','Journal','Server','View','Diff','Shared']
 
 # from directory.fichier import class
 from paramPy.param import ConfigElement
@@ -7,4 +7,11 @@ from paramPy.param import ParamFromJSON
 from paramPy.param import ParamMultiFromJSON
 from paramPy.param import Param
 from paramPy.param import ParamMulti
+from paramPy.param import ParamRow
 from paramPy.Trigger import Trigger
+from paramPy.Snapshot import ParamFromSnapshot
+from paramPy.Concurrent import ConcurrentParam
+from paramPy.Watcher import watch
+from paramPy.Path import compilePath
+from paramPy.Server import serve
+from paramPy.Shared import SharedParam
@@ -2,64 +2,225 @@
 #encoding:utf-8
 
 import sys
+import os
 import json
+import tempfile
 import re
 import copy
+import bisect
+import weakref
+
+from multiprocessing.pool import ThreadPool
 import Prompt
 import ParamExceptions
 import Trigger
+import Columns
+import Stream
+import Stats
+import Path
+import Transaction
+import Journal
+import View
+import Diff
+
+##############
+## Validation plans
+##############
+INVALID = object()
+EMAIL = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
+def compileCheck(type,choices):
+	choiceSet = frozenset(choices) if len(choices)>0 else None
+	if type == "text" or type == "password" or type == "file":
+		def check(value,emptyAllowed=True):
+			if not isinstance(value,basestring):
+				return False
+			if not emptyAllowed and len(value) == 0:
+				return False
+			return choiceSet is None or value in choiceSet
+	elif type == "number":
+		def check(value,emptyAllowed=True):
+			if not isinstance(value,int) and not (value if isinstance(value,unicode) else str(value)).isdigit():
+				return False
+			if not emptyAllowed and value == 0:
+				return False
+			return choiceSet is None or value in choiceSet
+	elif type == "email":
+		def check(value,emptyAllowed=True):
+			if not isinstance(value,basestring):
+				return False
+			if emptyAllowed and len(value) == 0:
+				return True
+			if EMAIL.match(value) is None:
+				return False
+			return choiceSet is None or value in choiceSet
+	elif type == "boolean":
+		def check(value,emptyAllowed=True):
+			if not isinstance(value,bool):
+				return False
+			return choiceSet is None or value in choiceSet
+	else:
+		def check(value,emptyAllowed=True):
+			return False
+	return check
+
+def compilePlan(check,cast):
+	def plan(value,emptyAllowed=True):
+		if not check(value,emptyAllowed):
+			return INVALID
+		return cast(value)
+	return plan
+
+def toText(value):
+	# text stays a str when it is ASCII, as before; other unicode is kept
+	if isinstance(value,unicode):
+		try:
+			return str(value)
+		except UnicodeEncodeError:
+			return value
+	return str(value)
+
+def compileCast(type):
+	if type == "text" or type == "password" or type == "file" or type == 'email':
+		return toText
+	elif type == "boolean":
+		return bool
+	else:
+		return int
+
+##############
+## ConfigMeta
+##############
+class ConfigMeta(object):
+	__slots__ = ('id','type','label','placeholder','required','choices','default','trigger','check','plan','cast')
+
+	def compile(self):
+		self.cast = compileCast(self.type)
+		self.check = compileCheck(self.type,self.choices)
+		self.plan = compilePlan(self.check,self.cast)
+
+	def replace(self,**changes):
+		newone = ConfigMeta()
+		for name in ConfigMeta.__slots__:
+			setattr(newone,name,changes[name] if name in changes else getattr(self,name))
+		if 'type' in changes or 'choices' in changes:
+			newone.compile()
+		return newone
+
+	def __getstate__(self):
+		return tuple(getattr(self,name) for name in ConfigMeta.__slots__[:-3])
+
+	def __setstate__(self,state):
+		for name,value in zip(ConfigMeta.__slots__,state):
+			setattr(self,name,value)
+		self.compile()
+
+def metaProperty(name):
+	def getter(self):
+		return getattr(self.meta,name)
+	def setter(self,value):
+		self.meta = self.meta.replace(**{name:value})
+		self.metaChanged()
+	return property(getter,setter)
 
 ##############
 ## ConfigElement
 ##############
 class ConfigElement(object):
+	__slots__ = ('meta','current','parent','hashCache')
+
+	id = metaProperty('id')
+	type = metaProperty('type')
+	label = metaProperty('label')
+	placeholder = metaProperty('placeholder')
+	required = metaProperty('required')
+	choices = metaProperty('choices')
+	default = metaProperty('default')
+	trigger = metaProperty('trigger')
+	plan = metaProperty('plan')
+	cast = metaProperty('cast')
+
 	def __init__(self,id,type,label=None,placeholder=None,required=False,choices=[],default=None,value=None,trigger={}):
+		meta = ConfigMeta()
+		self.meta = meta
+		self.parent = None
+		self.hashCache = None
+
 		# ID
-		self.id = str(id)
+		meta.id = str(id)
 		
 		# Type
-		self.type = str(type)
+		meta.type = str(type)
+		meta.choices = []
+		meta.trigger = Trigger.Trigger()
+		meta.compile()
 				
 		# Label
-		self.label = str(label) if label is not None else self.id
+		meta.label = str(label) if label is not None else meta.id
 		
 		# Placeholder
-		self.placeholder = str(placeholder) if placeholder is not None else "Enter " + self.label + " here"
+		meta.placeholder = str(placeholder) if placeholder is not None else "Enter " + meta.label + " here"
 		
 		# Required
-		self.required = bool(required)
+		meta.required = bool(required)
 		
 		# Choices
-		self.choices = []
 		if (isinstance(choices,list) or isinstance(choices,dict)) and len(choices)>0:
-			if self.type == 'password':
+			if meta.type == 'password':
 				raise ParamExceptions.WrongValue('405',str(id) + ': password not compatible with choices.')
 			for item in choices:
-				if not self.validateSingle(item,not self.required):
-					raise ValueError(str(item) + ' not correct for ' + str(self.id))
-			self.choices = choices
-		else:
-			self.choices = []
+				if not self.validateSingle(item,not meta.required):
+					raise ValueError(str(item) + ' not correct for ' + str(meta.id))
+			meta.choices = choices
+			meta.compile()
 			
 		# trigger
+		meta.default = None
 		self.setTrigger(trigger)
+		meta = self.meta
 		
 		# Default
 		if default is None:
-			self.default = None
-		elif not self.required and len(self.choices)>0:
+			meta.default = None
+		elif not meta.required and len(meta.choices)>0:
 			raise ParamExceptions.WrongValue('405',str(id) + ': default value for facultative choices not compatible.')
 		else:
 			if not self.validateSingle(default,True):
-				raise ValueError(str(default) + ' not correct for ' + str(self.id))
-			self.default = default
+				raise ValueError(str(default) + ' not correct for ' + str(meta.id))
+			meta.default = default
 			
 		# Value
 		self.setValue(value)
 			
+	def getValue(self):
+		return self.current
+
+	def assignValue(self,value):
+		self.current = value
+		self.changed()
+
+	value = property(getValue,assignValue)
+
 	def resetValue(self):
-		self.value = self.default
+		self.current = self.meta.default
+		self.changed()
+
+	def changed(self):
+		if self.parent is not None:
+			self.parent.itemChanged(self.meta.id)
+
+	def metaChanged(self):
+		if self.parent is not None:
+			self.parent.bumpSchema()
 		
+	def checkValue(self,value):
+		if value is None:
+			return None
+		result = self.meta.plan(value,True)
+		if result is INVALID:
+			raise ParamExceptions.WrongValue(401,str(value) + ' not correct for ' + str(self.meta.type))
+		return result
+
 	def setTrigger(self,trigger):
 		if not isinstance(trigger,dict):
 			raise TypeError("trigger parameter must be a dict instance")
@@ -68,73 +229,52 @@ class ConfigElement(object):
 		for key in trigger.keys():
 			if key != '*' and key is not None and not self.validateSingle(key):
 				raise ValueError(str(key) + ' not correct for ' + str(self.id))
-		self.trigger = trigger
+		self.meta = self.meta.replace(trigger=trigger)
+		self.metaChanged()
+		self.changed()
 		
 	def __str__(self):
 		return '<ConfigElement {0} (Type:{1}, required:{2}, Choices:{3})>'.format(self.id,self.type, str(self.required), str(len(self.choices)))
 		
+	def __getstate__(self):
+		return (self.meta,self.current,self.parent)
+
+	def __setstate__(self,state):
+		self.meta,self.current,self.parent = state
+		self.hashCache = None
+
 	def __deepcopy__(self,memo):
-		newone = type(self)(id=self.id,type=self.type,label=self.label,placeholder=self.placeholder,required=self.required,default=self.default,value=self.value,trigger={})
-		newone.choices = dict(self.choices)
-		newone.setTrigger(Trigger.Trigger(self.trigger))
+		newone = type(self).__new__(type(self))
+		newone.meta = self.meta
+		newone.current = self.current
+		newone.parent = None
+		newone.hashCache = self.hashCache
 		return newone
 
 	def convert(self,value):
 		if value is None:
 			return None
 		if isinstance(value,list):
-			return [self.convert(val) for val in value if val is not None]
+			return [self.cast(val) for val in value if val is not None]
 		else:
-			if self.type == "text" or self.type == "password" or self.type == "file" or self.type == 'email':
-				return str(value)
-			elif self.type == "boolean":
-				return bool(value)
-			else:
-				return int(value)
+			return self.cast(value)
 
 	def validate(self,value,emptyAllowed=True):
+		check = self.meta.check
 		if isinstance(value,list):
 			for it in value:
-				if not self.validateSingle(it,emptyAllowed):
+				if not check(it,emptyAllowed):
 					return False
 			return True
 		else:
-			return self.validateSingle(value,emptyAllowed)
+			return check(value,emptyAllowed)
 		
 	def validateSingle(self,value,emptyAllowed=True):
-		if self.type == "text" or self.type == "password" or self.type == "file":
-			if not isinstance(value,str) and not isinstance(value,unicode):
-				return False
-			if not emptyAllowed and len(value) == 0:
-				return False
-		elif self.type == "number":
-			if not isinstance(value,int) and not str(value).isdigit():
-				return False
-			if not emptyAllowed and value == 0:
-				return False
-		elif self.type == "email":
-			if not isinstance(value,str) and not isinstance(value,unicode):
-				return False
-			if emptyAllowed and len(value) == 0:
-				return True
-			elif not re.match(r"[^@]+@[^@]+\.[^@]+", value):
-				return False
-		elif self.type == "boolean":
-			if not isinstance(value,bool):
-				return False
-		else:
-			return False
-		if len(self.choices)>0 and value not in self.choices:
-			return False
-		return True
+		return self.meta.check(value,emptyAllowed)
 		
 	def setValue(self,value):
-		if value is None:
-			self.value = None
-		else:
-			if not self.validateSingle(value,True):
-				raise ParamExceptions.WrongValue(401,str(value) + ' not correct for ' + str(self.type))
-			self.value = self.convert(value)
+		self.current = self.checkValue(value)
+		self.changed()
 		
 	def cliPrompt(self,warning=''):
 		while self.getStatus != 'disabled':
@@ -148,11 +288,22 @@ class ConfigElement(object):
 			warning='Incorrect answer'
 			
 	def getValues(self,hidePassword=True,mode='json'):
-		if hidePassword and self.type == 'password':
+		if hidePassword and self.meta.type == 'password':
 			return '****'
 		else:
 			return self.value
 
+	def dumpValues(self):
+		return json.dumps(self.value,ensure_ascii=False)
+
+	def contentHash(self):
+		# kept while the value is the same object: setValue and the
+		# transactions always store a new one
+		cache = self.hashCache
+		if cache is None or cache[0] is not self.current:
+			cache = self.hashCache = (self.current,Diff.valueHash(self.current))
+		return cache[1]
+
 	def toJSON(self):
 		return {
 				'id':			self.id,
@@ -166,7 +317,7 @@ class ConfigElement(object):
 				}
 	
 	def getStatus(self):
-		return self.trigger[self.value]
+		return self.meta.trigger[self.value]
 
 	def isNone(self):
 		return self.value == None
@@ -180,18 +331,53 @@ def ConfigElementFromJSON(json):
 	trigger = json['trigger'] if 'trigger' in json.keys() else {}
 	return ConfigElement(id=json['id'],type=json['type'],label=label,placeholder=placeholder,required=required,choices=choices,default=default,trigger=trigger)
 
+##############
+## Change epochs
+##############
+# A change marks its ancestors dirty and bumps their versions up to the
+# first one already changed in the current epoch (see markDirty). Reading
+# a version or clearing a dirty flag starts a new epoch, so that the next
+# change walks up to the root again.
+EPOCH = 0
+
+def newEpoch():
+	global EPOCH
+	EPOCH += 1
+
 ##############
 ## Param
 ##############
 class Param(object):
-	def __init__(self,id,multi=False,label="",items=[],filename=None,trigger=[]):
+	__slots__ = ('id','multi','labelText','parent','dirty','version','epoch','fragment','valuesCache','schemaCache','hashCache','statuses','graph','trigger','items','layout','sharedLayout','schemaVersion','filename','shard','saved','journal','bindings','__weakref__')
+
+	def __init__(self,id,multi=False,label="",items=[],filename=None,trigger=[],shard=False):
 		self.id = str(id)
 		self.multi = multi
-		self.label = str(label) if str(label) is not None else self.id
+		self.labelText = str(label) if str(label) is not None else self.id
+		self.parent = None
+		self.journal = None
+		self.bindings = None
+		self.dirty = True
+		self.version = 0
+		self.epoch = -1
+		self.fragment = None
+		self.valuesCache = None
+		self.schemaCache = None
+		self.hashCache = None
+		self.statuses = None
+		self.graph = Trigger.TriggerGraph([])
+		self.trigger = self.graph.trigger
 		self.items = []
+		self.layout = {}
+		self.sharedLayout = False
+		self.schemaVersion = 0
 		self.addItems(items)
 		self.filename = filename if filename is not None else None
-		self.trigger = trigger
+		if shard and filename is None:
+			raise ParamExceptions.WrongValue('401',str(id) + ': a shard needs a file')
+		self.shard = bool(shard)
+		self.saved = None
+		self.setTrigger(trigger)
 		
 	def __str__(self):
 		return '<Param {0} ({1} items, Multi:{2})>'.format(self.id,str(len(self.items)),str(self.multi))
@@ -201,20 +387,38 @@ class Param(object):
 		
 	def __len__(self):
 		return len(self.items)
+
+	def __getstate__(self):
+		# path bindings are rebuilt by copies and pickles
+		state = {}
+		for cls in type(self).__mro__:
+			for name in cls.__dict__.get('__slots__',()):
+				if name != '__weakref__' and hasattr(self,name):
+					state[name] = getattr(self,name)
+		state['bindings'] = None
+		state['epoch'] = -1
+		return (None,state)
 		
 	def __deepcopy__(self,memo):
-		newone = type(self)(id=self.id,label=self.label,items=[],filename=self.filename,trigger=[])
-		newone.items = copy.deepcopy(self.items)
-		newone.trigger = copy.deepcopy(self.trigger)
+		newone = type(self)(id=self.id,label=self.label,items=[],filename=self.filename,trigger=self.graph,shard=self.shard)
+		newone.copyItemsFrom(self)
 		return newone
+
+	def copyItemsFrom(self,schema):
+		self.items = [copy.deepcopy(item) for item in schema.items]
+		for item in self.items:
+			item.parent = self
+		self.layout = schema.shareLayout()
+		self.sharedLayout = True
+		self.schemaChanged()
 		
 	def __getitem__(self,key):
 		if isinstance(key,int):
 			return self.items[key]
 		if isinstance(key,str):
-			for item in self.items:
-				if item.id == key:
-					return item
+			pos = self.layout.get(key)
+			if pos is not None:
+				return self.items[pos]
 			raise IndexError("list assignment index out of range")
 		raise TypeError("Param indices must be integers or str, not " + type(key))
 		
@@ -226,7 +430,14 @@ class Param(object):
 			raise TypeError("Param items only accept ConfigElement or Param, not " + type(key))
 		if key_int < 0 or key_int > len(self.items) -1:
 			raise IndexError("list assignment index out of range")
+		if self.layout.get(item.id,key_int) != key_int:
+			raise ParamExceptions.IdAlreadyUsed('402',str(item.id) + ' already used as ID')
+		layout = self.ownLayout()
+		del layout[self.items[key_int].id]
+		layout[item.id] = key_int
 		self.items[key_int] = item
+		item.parent = self
+		self.schemaChanged()
 		
 	def __delitem__(self, key):
 		if not isinstance(key,int):
@@ -235,30 +446,149 @@ class Param(object):
 		if key_int < 0 or key_int > len(self.items) -1:
 			raise IndexError("list assignment index out of range")
 		del self.items[key_int]
+		self.reindex()
+
+	def reindex(self):
+		self.layout = dict((item.id,pos) for pos,item in enumerate(self.items))
+		self.sharedLayout = False
+		for item in self.items:
+			item.parent = self
+		self.schemaChanged()
+
+	def shareLayout(self):
+		self.sharedLayout = True
+		return self.layout
+
+	def ownLayout(self):
+		if self.sharedLayout:
+			self.layout = dict(self.layout)
+			self.sharedLayout = False
+		return self.layout
+
+	def getLayout(self):
+		return self.layout
+
+	def getLabel(self):
+		return self.labelText
+
+	def setLabel(self,label):
+		self.labelText = str(label)
+		self.bumpSchema()
+
+	label = property(getLabel,setLabel)
+
+	def schemaChanged(self):
+		self.bumpSchema()
+		self.statusChanged()
+		self.markDirty()
+
+	def bumpSchema(self):
+		node = self
+		while node is not None:
+			node.schemaVersion += 1
+			node = node.parent
+
+	def get(self,path,hidePassword=True):
+		return Path.compilePath(path).get(self,hidePassword)
+
+	def update(self,changes):
+		Transaction.update(self,changes)
+
+	def transaction(self):
+		return Transaction.Transaction(self)
+
+	def setTrigger(self,trigger):
+		if not isinstance(trigger,Trigger.TriggerGraph):
+			trigger = Trigger.TriggerGraph(trigger)
+		self.graph = trigger
+		self.trigger = trigger.trigger
+		Param.schemaChanged(self)
+
+	def statusChanged(self):
+		self.statuses = None
+		if self.parent is not None:
+			self.parent.itemChanged(self.id)
+
+	def itemChanged(self,key):
+		statuses = self.statuses
+		if statuses:
+			if key in self.graph.downstream:
+				selfStatus = None in statuses
+				for node in self.graph.affected(key):
+					statuses.pop(node,None)
+				if selfStatus and None not in statuses and self.parent is not None:
+					self.parent.itemChanged(self.id)
+			else:
+				statuses.pop(key,None)
+		if not (self.dirty and self.epoch == EPOCH):
+			self.markDirty()
+		root = self.valueChanged()
+		if root.journal is not None:
+			root.journal.record(self,key)
+
+	def valueChanged(self):
+		child = self
+		node = self.parent
+		while node is not None:
+			if node.multi and isinstance(node,ParamMulti):
+				node.rowEdited(child)
+			child = node
+			node = node.parent
+		return child
+
+	def getRoot(self):
+		node = self
+		while node.parent is not None:
+			node = node.parent
+		return node
+
+	def useJournal(self,threshold=1000,sync=False):
+		self.journal = Journal.Journal(self,threshold,sync)
+		return self.journal
+
+	def markDirty(self):
+		# an ancestor changed in the current epoch has had its version
+		# bumped since it was last read, and so have the ones above it
+		node = self
+		while node is not None and not (node.dirty and node.epoch == EPOCH):
+			node.dirty = True
+			node.version += 1
+			node.epoch = EPOCH
+			node = node.parent
 
 	def getStatus(self,key=None):
+		statuses = self.statuses
+		if statuses is None:
+			statuses = self.statuses = {}
+		elif key in statuses:
+			return statuses[key]
+		status = ''
 		if key is None:
-			for trig in self.trigger: 
-				if all(x in trig.keys() for x in ['src_id','src_status','dst_id','dst_status']) and trig['src_id'] != 'self' and trig['dst_id'] == 'self':
-					if self[trig['src_id']].getStatus() == trig['src_status']:
-						return trig['dst_status']
-			return ''
-		if self[key].getStatus() != "":
-			return self[key].getStatus()
+			for src,srcStatus,dstStatus in self.graph.selfRules:
+				if self[src].getStatus() == srcStatus:
+					status = dstStatus
+					break
 		else:
-			for trig in self.trigger:
-				if all(x in trig.keys() for x in ['src_id','src_status','dst_id','dst_status']):
-					src = self if trig['src_id'] == 'self' else self[trig['src_id']]
-					if src.getStatus() == trig['src_status'] and key == trig['dst_id']:
-						return trig['dst_status']
-		return ''
+			status = self[key].getStatus()
+			if status == "":
+				for src,srcStatus,dstStatus in self.graph.rulesByDst.get(key,()):
+					value = self.getStatus() if src == 'self' else self[src].getStatus()
+					if value == srcStatus:
+						status = dstStatus
+						break
+		statuses[key] = status
+		return status
 		
 	def addItem(self,item):
-		if len([it for it in self.items if it.id == item.id])>0:
+		if item.id in self.layout:
 			raise ParamExceptions.IdAlreadyUsed('402',str(item.id) + ' already used as ID')
 		if not self.validate(item):
 			raise ParamExceptions.WrongValue('401',str(item) + ' not correct for Param or ConfigElement')
-		self.items.append(copy.deepcopy(item))
+		newitem = copy.deepcopy(item)
+		newitem.parent = self
+		self.items.append(newitem)
+		self.ownLayout()[newitem.id] = len(self.items)-1
+		self.schemaChanged()
 		
 	def addItems(self,items):
 		if not isinstance(items,list):
@@ -298,9 +628,43 @@ class Param(object):
 		return True
 		
 	def getValues(self,hidePassword=True,mode='json'):
+		return LazyRows.copyJSON(self.exportValues(hidePassword))
+
+	# getValues without the copy: shared with the cache and the parents, never modify it
+	def exportValues(self,hidePassword=True):
+		hidePassword = bool(hidePassword)
+		cache = self.valuesCache
+		if cache is None or cache[0] != self.version:
+			cache = self.valuesCache = (self.version,{})
+		result = cache[1].get(hidePassword)
+		if result is None:
+			newEpoch()
+			result = cache[1][hidePassword] = self.buildValues(hidePassword)
+		return result
+
+	def view(self,hidePassword=True,hideDisabled=False):
+		return View.ParamView(self,hidePassword,hideDisabled)
+
+	def contentHash(self):
+		cache = self.hashCache
+		if cache is None or cache[0] != self.version:
+			newEpoch()
+			cache = self.hashCache = (self.version,) + self.buildHash()
+		return cache[1]
+
+	def buildHash(self):
+		return Diff.itemsHash([(item.id,item.contentHash()) for item in self.items]),None
+
+	def diff(self,other):
+		return Diff.diff(self,other)
+
+	def patch(self,changes):
+		Diff.patch(self,changes)
+
+	def buildValues(self,hidePassword):
 		result = {}
 		for item in self.items:
-			result.update(copy.deepcopy({item.id:item.getValues(hidePassword)}))
+			result[item.id] = item.exportValues(hidePassword) if isinstance(item,Param) else item.getValues(hidePassword)
 		return result
 
 	def loadValuesFromJSON(self,values):
@@ -312,14 +676,14 @@ class Param(object):
 		if not isinstance(json,dict):
 			raise ParamExceptions.WrongValue('401',str(json) + ' not correct for ' + str(self.id))
 		for key in json.keys():
-			for it in self.items:
-				if str(it.id) == str(key):
-					if isinstance(it,Param):
-						it.loadValuesFromJSON({str(key):json[key]})
-					else:
-						it.setValue(json[key])
-					del json[key]
-					break
+			pos = self.layout.get(str(key))
+			if pos is not None:
+				it = self.items[pos]
+				if isinstance(it,Param):
+					it.loadValuesFromJSON({str(key):json[key]})
+				else:
+					it.setValue(json[key])
+				del json[key]
 		if len(json)>0:
 			raise ParamExceptions.WrongValue('403',str(json.keys()[0]) + ' not correct for ' + str(self.id))
 			
@@ -331,30 +695,183 @@ class Param(object):
 		return all(item.isNone() or self.getStatus(item.id) == 'disabled' for item in self.items)
 
 	def toJSON(self):
-		return {
+		return LazyRows.copyJSON(self.exportSchema())
+
+	# toJSON without the copy: shared with the cache and the parents, never modify it
+	def exportSchema(self):
+		cache = self.schemaCache
+		if cache is None or cache[0] != self.schemaVersion or cache[1] != self.filename:
+			cache = self.schemaCache = (self.schemaVersion,self.filename,self.buildSchema())
+		return cache[2]
+
+	def schemaItems(self):
+		return [item.exportSchema() if isinstance(item,Param) else item.toJSON() for item in self.items]
+
+	def buildSchema(self):
+		result = {
 				'id': 		self.id,
 				'type':		'Param',
 				'label':	self.label,
-				'items':	[item.toJSON() for item in self.items],
+				'items':	self.schemaItems(),
 				'trigger':	self.trigger
 				}
+		if self.filename is not None and self.parent is not None:
+			result['file'] = self.filename
+		if self.shard:
+			result['shard'] = True
+		return result
 
-	def loadFromFile(self,filename=None):
+	def loadFromFile(self,filename=None,stream=False,progress=None):
 		if filename is None and self.filename is None:
 			raise AttributeError("No filename provided")
-		if filename is not None:
+		if filename is not None and filename != self.filename:
 			self.filename = filename
-		with open(self.filename) as data_file:   
-			content = json.load(data_file) 
-			self.loadValuesFromJSON({self.id:content})
+			self.bumpSchema()
+		if self.journal is not None:
+			self.journal.load(stream,progress)
+		else:
+			self.readFile(self.filename,stream,progress)
+
+	def readFile(self,filename,stream=False,progress=None):
+		content = None
+		if stream:
+			with open(filename,'rb') as data_file:
+				reader = Stream.JSONStream(data_file,progress=progress)
+				self.streamValues(reader)
+				reader.end()
+		else:
+			with open(filename) as data_file:   
+				content = json.load(data_file) 
+				self.loadValuesFromJSON({self.id:dict(content) if isinstance(content,dict) else content})
+		shards = self.shards()
+		if len(shards)>0:
+			self.readShards(filename,shards,stream,progress)
+			# the file still holds sharded values (or was streamed): rewrite it on next save
+			merged = content is None or any(item.id in content for item in shards)
+			self.saved = None if merged else self.dumpValues()
+
+	def stats(self):
+		return Stats.snapshot()
+
+	def footprint(self):
+		return Stats.footprint(self)
+
+	def shards(self):
+		if self.multi or isinstance(self.parent,ParamMulti):
+			return []
+		return [item for item in self.items if isinstance(item,Param) and item.shard]
+
+	def shardFilename(self,filename,item):
+		return os.path.join(os.path.dirname(os.path.abspath(filename)),item.filename)
+
+	def valueFiles(self,filename,path=''):
+		"""
+			(path in the tree, file) of the values file and of the files of
+			the shards below, the values file first.
+		"""
+		files = [(path,filename)]
+		for item in self.shards():
+			files.extend(item.valueFiles(self.shardFilename(filename,item),item.id if path == '' else path + '.' + item.id))
+		return files
+
+	def readShards(self,filename,shards,stream=False,progress=None):
+		# shards are loaded detached, so that each thread only changes its
+		# own subtree; this Param learns of their changes once they are back
+		def readShard(item):
+			path = self.shardFilename(filename,item)
+			if os.path.exists(path):
+				item.readFile(path,stream,progress)
+			item.dumpValues()
+		for item in shards:
+			item.parent = None
+		try:
+			if len(shards) == 1:
+				readShard(shards[0])
+			else:
+				pool = ThreadPool(min(len(shards),SHARD_THREADS))
+				try:
+					pool.map(readShard,shards)
+				finally:
+					pool.close()
+					pool.join()
+		finally:
+			for item in shards:
+				item.parent = self
+				self.itemChanged(item.id)
+
+	def streamValues(self,stream):
+		if stream.peek() != '{':
+			raise ParamExceptions.WrongValue('401',str(stream.readValue()) + ' not correct for ' + str(self.id))
+		for key in stream.iterObject():
+			pos = self.layout.get(str(key))
+			if pos is None:
+				raise ParamExceptions.WrongValue('403',str(key) + ' not correct for ' + str(self.id))
+			it = self.items[pos]
+			if isinstance(it,Param):
+				it.streamValues(stream)
+			else:
+				it.setValue(stream.readValue())
+				stream.applied()
 
 	def saveToFile(self,filename=None):
 		if filename is None and self.filename is None:
 			raise AttributeError("No filename provided")
-		if filename is not None:
+		if filename is not None and filename != self.filename:
 			self.filename = filename
-		with open(self.filename, "w") as outfile:
-			json.dump(self.getValues(hidePassword=False), outfile, ensure_ascii=False)
+			self.bumpSchema()
+		if self.journal is not None:
+			self.journal.compact()
+		else:
+			self.writeFile(self.filename)
+
+	def writeFile(self,filename):
+		content = self.dumpValues()
+		shards = self.shards()
+		if len(shards) == 0:
+			atomicWrite(filename,content)
+			return
+		if content != self.saved or not os.path.exists(filename):
+			atomicWrite(filename,content)
+			self.saved = content
+		for item in shards:
+			path = self.shardFilename(filename,item)
+			if item.dirty or item.fragment is None or not os.path.exists(path):
+				item.writeFile(path)
+
+	def dumpValues(self):
+		if self.dirty or self.fragment is None:
+			shards = self.shards()
+			self.fragment = '{' + ', '.join(json.dumps(item.id) + ': ' + item.dumpValues() for item in self.items if item not in shards) + '}'
+			self.dirty = False
+			newEpoch()
+		return self.fragment
+
+SHARD_THREADS = 8
+
+# mkstemp creates files as 0600: new files get the mode open() would give
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def atomicWrite(filename,content):
+	if isinstance(content,unicode):
+		content = content.encode('utf-8')
+	directory,name = os.path.split(os.path.abspath(filename))
+	fd,tmpname = tempfile.mkstemp(dir=directory,prefix='.' + name + '.',suffix='.tmp')
+	try:
+		with os.fdopen(fd,'wb') as outfile:
+			outfile.write(content)
+			outfile.flush()
+			os.fsync(outfile.fileno())
+		if os.path.exists(filename):
+			os.chmod(tmpname,os.stat(filename).st_mode & 07777)
+		else:
+			os.chmod(tmpname,0666 & ~UMASK)
+		os.rename(tmpname,filename)
+
+	except:
+		if os.path.exists(tmpname):
+			os.remove(tmpname)
+		raise
 
 
 def ParamFromJSON(json):
@@ -370,90 +887,359 @@ def ParamFromJSON(json):
 			else:
 				items.append(ConfigElementFromJSON(item))
 	trigger = json['trigger'] if 'trigger' in json.keys() else {}
-	return Param(id,label=label,items=items,trigger=trigger)
+	filename = json['file'] if 'file' in json.keys() else None
+	shard = json['shard'] if 'shard' in json.keys() else False
+	return Param(id,label=label,items=items,filename=filename,trigger=trigger,shard=shard)
 
 ##############
 ## ParamMulti
 ##############	
 class ParamMulti(Param):
-	def __init__(self,id,multi=True,label="",items=[],filename=None,trigger=[]):
-		Param.__init__(self,id,multi=True,label=label,items=[],filename=filename)
-		self.values = []
+	__slots__ = ('storage','deferValidation','valueSets','indexes','indexCache','rowHashCache')
+
+	def __init__(self,id,multi=True,label="",items=[],filename=None,trigger=[],storage='param',deferValidation=False,indexes=[],shard=False):
+		Param.__init__(self,id,multi=True,label=label,items=[],filename=filename,shard=shard)
+		if storage not in ['param','shared','columnar','lazy']:
+			raise ParamExceptions.WrongValue('401',str(storage) + ' not correct storage for ' + str(self.id))
+		self.storage = storage
+		self.deferValidation = bool(deferValidation)
+		self.valueSets = []
+		self.indexes = []
+		self.indexCache = None
+		self.rowHashCache = None
 		self.addItems(items)
-		self.trigger = trigger
+		self.setRows(self.emptyValues())
+		self.setTrigger(trigger)
+		self.setIndexes(indexes)
 		
 	def __str__(self):
 		return '<ParamMulti {0} ({1} items, Multi:{2}, ValueSets:{3})>'.format(self.id,str(len(self.items)),str(self.multi),str(len(self.values)))
+
+	def __getstate__(self):
+		# the indexes locate rows by id(): copies and pickles rebuild them
+		state = Param.__getstate__(self)
+		state[1]['indexCache'] = None
+		state[1]['rowHashCache'] = None
+		return state
 		
 	def __deepcopy__(self,memo):
-		newone = type(self)(id=self.id,label=self.label,items=[],filename=self.filename)
-		newone.items = copy.deepcopy(self.items)
-		newone.values = copy.deepcopy(self.values)
-		newone.trigger = copy.deepcopy(self.trigger)
+		newone = type(self)(id=self.id,label=self.label,items=[],filename=self.filename,trigger=self.graph,storage=self.storage,deferValidation=self.deferValidation,shard=self.shard)
+		newone.copyItemsFrom(self)
+		newone.indexes = self.indexes
+		newone.setRows(newone.copyRows(self.values))
 		return newone
 
-	def addItem(self,item):
+	def copyRows(self,rows):
+		if isinstance(rows,(ColumnStore,LazyRows)):
+			return rows.copyTo(self)
+		return [row.copyTo(self) if isinstance(row,ParamRow) else self.adopt(copy.deepcopy(row)) for row in rows]
+
+	def adopt(self,row):
+		row.parent = self
+		if row.dirty:
+			self.markDirty()
+		return row
+
+	def getRows(self):
+		return self.valueSets
+
+	def setRows(self,rows):
+		if isinstance(rows,list):
+			if not isinstance(rows,RowList) or rows.schema is not self:
+				rows = RowList(self,rows)
+			rows.adopt(rows)
+		self.valueSets = rows
+		self.rowsChanged(rows,'rows')
+
+	values = property(getRows,setRows)
+
+	def rowsChanged(self,rows,op,value=None):
+		"""
+			Called by the value sets containers when they are edited: ``op``
+			and ``value`` are those of the journal record ('add' and the
+			value set, 'del' and its index, or 'rows').
+		"""
+		self.markDirty()
+		if rows is not self.valueSets:
+			return
+		cache = self.indexCache
+		if cache is not None:
+			if op == 'add':
+				pos = len(rows)-1
+				cache.added(Diff.rowAt(self,pos),isinstance(rows,RowStore))
+			elif op == 'del':
+				cache.removed(value)
+			else:
+				self.indexCache = None
+		hashes = self.rowHashCache
+		if hashes is not None:
+			if op == 'del':
+				if value < len(hashes[0]):
+					del hashes[0][value]
+			elif op != 'add':
+				self.rowHashCache = None
+		self.journalRows(op,value)
+
+	def rowEdited(self,row):
+		rows = self.valueSets
+		pos = rows.edited(row) if isinstance(rows,RowStore) else None
+		cache = self.indexCache
+		if cache is not None and not cache.edited(row,pos):
+			self.indexCache = None
+		hashes = self.rowHashCache
+		if hashes is not None:
+			pos = self.layout.get(row.id) if isinstance(row,Param) else None
+			if pos is not None and self.items[pos] is row:
+				# a value set stored as ParamRow changed below this item
+				self.rowHashCache = None
+			else:
+				hashes[1].add(id(row))
+
+	def addRow(self,row):
+		if isinstance(self.values,(ColumnStore,LazyRows)):
+			self.values.append(row)
+		elif isinstance(row,dict):
+			self.values.append(self.buildRow(LazyRows.copyJSON(row)))
+		elif self.storage == 'shared':
+			self.values.append(self.buildRow(row.getValues(hidePassword=False)))
+		else:
+			self.values.append(self.adopt(row))
+
+	def removeRow(self,index):
+		del self.values[index]
+
+	def journalRows(self,op,value=None):
+		journal = self.getRoot().journal
+		if journal is not None:
+			journal.recordRows(self,op,value)
+
+	def setIndexes(self,indexes):
+		specs = []
+		for index in indexes:
+			if isinstance(index,basestring):
+				index = {'field':index}
+			if not isinstance(index,dict) or 'field' not in index:
+				raise ParamExceptions.WrongValue('401',str(index) + ' not correct index for ' + str(self.id))
+			spec = {'field':str(index['field']),'unique':bool(index.get('unique',False))}
+			self.fieldPlan(spec['field'])
+			specs.append(spec)
+		self.indexes = specs
+		self.indexCache = None
+		self.bumpSchema()
+
+	def fieldPlan(self,field):
+		node = self
+		plan = []
+		for id in field.split('.'):
+			if not isinstance(node,Param) or (isinstance(node,ParamMulti) and node is not self) or id not in node.layout:
+				raise ParamExceptions.WrongValue('401',field + ' not correct index for ' + str(self.id))
+			pos = node.layout[id]
+			plan.append((pos,id))
+			node = node.items[pos]
+		if not isinstance(node,ConfigElement):
+			raise ParamExceptions.WrongValue('401',field + ' not correct index for ' + str(self.id))
+		return plan
+
+	@staticmethod
+	def fieldValue(row,plan):
+		node = row
+		for pos,id in plan:
+			if isinstance(node,Param):
+				node = node.items[pos]
+			elif isinstance(node,ParamRow):
+				node = node.data[pos]
+			elif isinstance(node,dict):
+				node = node.get(id)
+			else:
+				return None
+		if isinstance(node,ConfigElement):
+			return node.value
+		return node
+
+	def fieldValues(self,plan,rows):
+		if isinstance(rows,ColumnStore):
+			path = tuple(id for pos,id in plan)
+			return rows.columns[[column for column,item in rows.layout].index(path)].values()
+		if isinstance(rows,LazyRows):
+			rows = rows.entries
+		return [ParamMulti.fieldValue(row,plan) for row in rows]
+
+	def buildIndexes(self):
+		self.indexCache = RowIndexes(self,self.values)
+		return self.indexCache
+
+	def checkUnique(self,rows=None):
+		"""
+			Raise IdAlreadyUsed if two value sets share the value of a
+			unique index: those of the ParamMulti, or ``rows`` (as returned
+			by loadRows) before they are set.
+		"""
+		if rows is not None:
+			cache = RowIndexes(self,rows)
+		else:
+			cache = self.indexCache
+			if cache is None:
+				cache = self.buildIndexes()
+		for field,(unique,plan,index,keys) in cache.fields.items():
+			if unique:
+				for value,positions in index.items():
+					if len(positions)>1:
+						raise ParamExceptions.IdAlreadyUsed('409',str(value) + ' already used as ' + field + ' in ' + str(self.id))
+
+	def hasUnique(self):
+		return any(spec['unique'] for spec in self.indexes)
+
+	def findBy(self,field,value):
+		cache = self.indexCache
+		if cache is None:
+			cache = self.buildIndexes()
+		if field not in cache.fields:
+			raise ParamExceptions.WrongValue('401',str(field) + ' not indexed in ' + str(self.id))
+		unique,plan,index,keys = cache.fields[field]
+		positions = [cache.position(serial) for serial in index.get(value,())]
+		if unique:
+			if len(positions)>1:
+				raise ParamExceptions.IdAlreadyUsed('409',str(value) + ' already used as ' + field + ' in ' + str(self.id))
+			return self.values[positions[0]] if len(positions)>0 else None
+		return [self.values[pos] for pos in positions]
+
+	def schemaChanged(self):
+		Param.schemaChanged(self)
 		if len(self.values)>0:
 			print "Warning! The values of {0} has been reset since adding a new ConfigElement".format(self.id)
-			self.resetValue()
-		Param.addItem(self,item)
+		self.resetValue()
+
+	def emptyValues(self):
+		if self.storage == 'columnar':
+			return ColumnStore(self)
+		if self.storage == 'lazy':
+			return LazyRows(self)
+		return []
 		
 	def loadValuesFromJSON(self,values):
 		if not isinstance(values,dict):
 			raise ParamExceptions.WrongValue('401',str(values) + ' not correct for ' + str(self.id))
 		if self.id not in values.keys():
 			raise ParamExceptions.WrongValue('407',str(self.id) + ' not in input')
-		json = values[self.id]
+		rows = self.loadRows(values[self.id])
+		if self.hasUnique():
+			self.checkUnique(rows)
+		self.setRows(rows)
+
+	def loadRows(self,json):
 		if isinstance(json,dict):
 			json = [json]
 		if not isinstance(json,list):
 			raise ParamExceptions.WrongValue('401',str(json) + ' not correct for ' + str(self.id))
-		self.values = []
-		for item in json:
-			newitem = Param(id=self.id,multi=False,label=self.label,items=copy.deepcopy(self.items),filename=None,trigger=self.trigger)
-			for key in item.keys():
-				for it in newitem.items:
-					if str(it.id) == str(key):
-						if isinstance(it,Param):
-							it.loadValuesFromJSON({str(it.id):item[key]})
-						else:
-							it.setValue(item[key])
-						del item[key]
-						break
-			if len(item)>0:
-				raise ParamExceptions.WrongValue('403',str(item[0]) + ' not correct for ' + str(self.id))
-			self.values.append(newitem)
+		if self.storage in ['columnar','lazy']:
+			rows = self.emptyValues()
+			rows.extend(json)
+			return rows
+		return [self.buildRow(item) for item in json]
+
+	def streamValues(self,stream):
+		if stream.peek() != '[':
+			rows = self.loadRows(stream.readValue())
+			stream.applied()
+		else:
+			rows = self.emptyValues()
+			for none in stream.iterArray():
+				row = stream.readValue()
+				rows.append(row if isinstance(rows,(ColumnStore,LazyRows)) else self.buildRow(row))
+				stream.applied()
+		if self.hasUnique():
+			self.checkUnique(rows)
+		self.setRows(rows)
+
+	def newRow(self):
+		if self.storage == 'shared':
+			return ParamRow(self)
+		row = Param(id=self.id,multi=False,label=self.label,items=[],filename=None,trigger=self.graph)
+		row.copyItemsFrom(self)
+		return row
+
+	def buildRow(self,values):
+		newitem = self.newRow()
+		newitem.loadValuesFromJSON({self.id:values})
+		if isinstance(newitem,Param):
+			self.adopt(newitem)
+		return newitem
 
 	def cliPrompt(self):
 		if len(self) < 1:
 			raise ParamExceptions.WrongValue('406','ParamMulti {0} is empty'.format(self.id))
 		while True:
-			newitem = Param(id=self.id,multi=False,label=self.label,items=copy.deepcopy(self.items),filename=None,trigger=self.trigger)
+			newitem = Param(id=self.id,multi=False,label=self.label,items=self.items,filename=None,trigger=self.graph)
 			newitem.cliPrompt()
 			if not newitem.isNone():
-				self.values.append(newitem)
+				self.addRow(newitem)
 				if not Prompt.promptYN('Another {0}?'.format(self.label),default='n'):
 					break
 			else:
 				break
 				
-	def getValues(self,hidePassword=True,mode='json'):
+	def view(self,hidePassword=True,hideDisabled=False):
+		return View.RowsView(self,None,hidePassword,hideDisabled)
+
+	def buildHash(self):
+		rowHashes = Diff.rowHashes(self)
+		return Diff.rowsHash(rowHashes),rowHashes
+
+	def rowHashes(self):
+		self.contentHash()
+		return self.hashCache[2]
+
+	def buildValues(self,hidePassword):
+		rows = self.values
+		if isinstance(rows,(ColumnStore,LazyRows)):
+			return rows.getValues(hidePassword)
+		return [row.exportValues(hidePassword) if isinstance(row,Param) else row.getValues(hidePassword) for row in rows]
+
+	def exportRows(self,rows,hidePassword=True):
+		if isinstance(rows,(ColumnStore,LazyRows)):
+			return rows.getValues(hidePassword)
 		result = []
-		for value in self.values:
-			result.append(copy.deepcopy(value.getValues(hidePassword)))
+		for value in rows:
+			if isinstance(value,dict):
+				result.append(LazyRows.exportRow(self,value,hidePassword))
+			else:
+				result.append(copy.deepcopy(value.getValues(hidePassword)))
 		return result
 
 	def resetValue(self):
-		self.values = []
+		self.setRows(self.emptyValues())
 
-	def toJSON(self):
-		return {
+	def dumpValues(self):
+		if self.dirty or self.fragment is None:
+			if isinstance(self.values,ColumnStore):
+				self.fragment = json.dumps(self.values.getValues(hidePassword=False),ensure_ascii=False)
+				for row in self.values.rows.values():
+					row.dumpValues()
+			elif isinstance(self.values,LazyRows):
+				self.fragment = self.values.dumpValues()
+			else:
+				self.fragment = '[' + ', '.join(row.dumpValues() for row in self.values) + ']'
+			self.dirty = False
+			newEpoch()
+		return self.fragment
+
+	def buildSchema(self):
+		result = {
 				'id': 		self.id,
 				'type':		'ParamMulti',
 				'label':	self.label,
-				'items':	[item.toJSON() for item in self.items],
-				'trigger':	self.trigger
+				'items':	self.schemaItems(),
+				'trigger':	self.trigger,
+				'storage':	self.storage,
+				'deferValidation':	self.deferValidation,
+				'indexes':	self.indexes
 				}
+		if self.filename is not None and self.parent is not None:
+			result['file'] = self.filename
+		if self.shard:
+			result['shard'] = True
+		return result
+
 
 def ParamMultiFromJSON(json):
 	id = json['id']
@@ -468,7 +1254,754 @@ def ParamMultiFromJSON(json):
 			else:
 				items.append(ConfigElementFromJSON(item))
 	trigger = json['trigger'] if 'trigger' in json.keys() else {}
-	return ParamMulti(id,label=label,items=items,trigger=trigger)
+	storage = json['storage'] if 'storage' in json.keys() else 'param'
+	deferValidation = json['deferValidation'] if 'deferValidation' in json.keys() else False
+	filename = json['file'] if 'file' in json.keys() else None
+	indexes = json['indexes'] if 'indexes' in json.keys() else []
+	shard = json['shard'] if 'shard' in json.keys() else False
+	return ParamMulti(id,label=label,items=items,filename=filename,trigger=trigger,storage=storage,deferValidation=deferValidation,indexes=indexes,shard=shard)
+
+
+
+##############
+## ParamRow
+##############
+class ParamRow(object):
+	__slots__ = ('schema','data')
+
+	def __init__(self,schema,data=None):
+		self.schema = schema
+		if data is None:
+			data = [ParamRow.blank(item) for item in schema.items]
+		self.data = data
+
+	@staticmethod
+	def blank(item):
+		if isinstance(item,ParamMulti):
+			return []
+		if isinstance(item,Param):
+			return ParamRow(item)
+		return item.value
+
+	def __str__(self):
+		return '<ParamRow {0} ({1} items)>'.format(self.schema.id,str(len(self.data)))
+
+	def __repr__(self):
+		return str(self)
+
+	def __len__(self):
+		return len(self.data)
+
+	def __deepcopy__(self,memo):
+		return self.copyTo(self.schema)
+
+	def __reduce__(self):
+		return (ParamRow,(self.schema,self.data))
+
+	def copyTo(self,schema):
+		data = []
+		for item,value in zip(schema.items,self.data):
+			if isinstance(item,ParamMulti):
+				value = item.copyRows(value)
+			elif isinstance(item,Param):
+				value = value.copyTo(item)
+			data.append(value)
+		return ParamRow(schema,data)
+
+	def __getitem__(self,key):
+		if isinstance(key,int):
+			return self.data[key]
+		if isinstance(key,str):
+			layout = self.schema.getLayout()
+			if key in layout:
+				return self.data[layout[key]]
+			raise IndexError("list assignment index out of range")
+		raise TypeError("ParamRow indices must be integers or str, not " + str(type(key)))
+
+	def setValue(self,key,value):
+		layout = self.schema.getLayout()
+		if key not in layout:
+			raise IndexError("list assignment index out of range")
+		pos = layout[key]
+		self.data[pos] = ParamRow.loadValue(self.schema.items[pos],value)
+		self.schema.markDirty()
+		if isinstance(self.schema,ParamMulti):
+			self.schema.rowEdited(self)
+		root = self.schema.valueChanged()
+		if root.journal is not None:
+			root.journal.record(self,key)
+
+	@staticmethod
+	def loadValue(item,value):
+		if isinstance(item,ParamMulti):
+			return item.loadRows(value)
+		if isinstance(item,Param):
+			row = ParamRow(item)
+			row.loadValuesFromJSON({item.id:value})
+			return row
+		return item.checkValue(value)
+
+	def loadValuesFromJSON(self,values):
+		if not isinstance(values,dict):
+			raise ParamExceptions.WrongValue('401',str(values) + ' not correct for ' + str(self.schema.id))
+		if str(self.schema.id) not in [str(key) for key in values.keys()]:
+			raise ParamExceptions.WrongValue('407',str(self.schema.id) + ' not in input')
+		json = values[self.schema.id]
+		if not isinstance(json,dict):
+			raise ParamExceptions.WrongValue('401',str(json) + ' not correct for ' + str(self.schema.id))
+		layout = self.schema.getLayout()
+		for key in json.keys():
+			pos = layout.get(str(key))
+			if pos is not None:
+				self.data[pos] = ParamRow.loadValue(self.schema.items[pos],json[key])
+				del json[key]
+		if len(json)>0:
+			raise ParamExceptions.WrongValue('403',str(json.keys()[0]) + ' not correct for ' + str(self.schema.id))
+
+	def dumpValues(self):
+		return json.dumps(self.getValues(hidePassword=False),ensure_ascii=False)
+
+	def getValues(self,hidePassword=True,mode='json'):
+		result = {}
+		for item,value in zip(self.schema.items,self.data):
+			if isinstance(item,ParamMulti):
+				value = item.exportRows(value,hidePassword)
+			elif isinstance(item,Param):
+				value = value.getValues(hidePassword)
+			elif hidePassword and item.type == 'password':
+				value = '****'
+			result[item.id] = value
+		return result
+
+	def view(self,hidePassword=True,hideDisabled=False):
+		return View.RowView(self.schema,self,hidePassword,hideDisabled)
+
+	def statusOf(self,key):
+		item = self.schema[key]
+		if isinstance(item,ParamMulti):
+			return item.getStatus()
+		if isinstance(item,Param):
+			return self[key].getStatus()
+		return item.trigger[self[key]]
+
+	def getStatus(self,key=None):
+		graph = self.schema.graph
+		if key is None:
+			for src,srcStatus,dstStatus in graph.selfRules:
+				if self.statusOf(src) == srcStatus:
+					return dstStatus
+			return ''
+		status = self.statusOf(key)
+		if status != "":
+			return status
+		for src,srcStatus,dstStatus in graph.rulesByDst.get(key,()):
+			value = self.getStatus() if src == 'self' else self.statusOf(src)
+			if value == srcStatus:
+				return dstStatus
+		return ''
+
+	def isNone(self):
+		for item,value in zip(self.schema.items,self.data):
+			if isinstance(value,ParamRow):
+				empty = value.isNone()
+			elif isinstance(item,ParamMulti):
+				empty = len(value) == 0
+			else:
+				empty = value is None
+			if not empty and self.getStatus(item.id) != 'disabled':
+				return False
+		return True
+
+	def materialize(self):
+		newone = Param(id=self.schema.id,multi=False,label=self.schema.label,items=self.schema.items,filename=None,trigger=self.schema.graph)
+		newone.loadValuesFromJSON({self.schema.id:self.getValues(hidePassword=False)})
+		return newone
+
+##############
+## RowIndexes
+##############
+class RowIndexes(object):
+	"""
+		The ``RowIndexes`` class
+		========================
+
+		Indexes of a ParamMulti (see ``setIndexes``): for each indexed
+		field, the value sets per value. Kept up to date when a value set
+		is added at the end, removed, or has a field edited; any other
+		change of the value sets drops it, and it is rebuilt on next use.
+
+		Value sets are numbered in order when indexed or added, and the
+		indexes hold these serials: a removal shifts no entry, and the
+		position of a serial is found by bisection in ``serials``.
+	"""
+	def __init__(self,multi,rows):
+		self.fields = {}
+		self.serials = range(len(rows))
+		self.next = len(rows)
+		for spec in multi.indexes:
+			plan = multi.fieldPlan(spec['field'])
+			keys = dict(enumerate(multi.fieldValues(plan,rows)))
+			index = {}
+			for serial in self.serials:
+				value = keys[serial]
+				if value is not None or not spec['unique']:
+					index.setdefault(value,[]).append(serial)
+			self.fields[spec['field']] = (spec['unique'],plan,index,keys)
+		# serials of the stored value sets by id(), to find an edited one;
+		# the stores give the position of their own value sets
+		stored = () if isinstance(rows,RowStore) else enumerate(rows)
+		self.rowSerials = dict((id(row),serial) for serial,row in stored)
+		self.rowIds = dict((serial,key) for key,serial in self.rowSerials.items())
+
+	def position(self,serial):
+		return bisect.bisect_left(self.serials,serial)
+
+	def positionOf(self,row):
+		serial = self.rowSerials.get(id(row))
+		return None if serial is None else self.position(serial)
+
+	def added(self,row,transient=False):
+		serial = self.next
+		self.next += 1
+		self.serials.append(serial)
+		if not transient:
+			self.rowSerials[id(row)] = serial
+			self.rowIds[serial] = id(row)
+		for field,(unique,plan,index,keys) in self.fields.items():
+			value = ParamMulti.fieldValue(row,plan)
+			keys[serial] = value
+			if value is not None or not unique:
+				index.setdefault(value,[]).append(serial)
+
+	def removed(self,pos):
+		serial = self.serials.pop(pos)
+		key = self.rowIds.pop(serial,None)
+		if key is not None:
+			del self.rowSerials[key]
+		for field,(unique,plan,index,keys) in self.fields.items():
+			value = keys.pop(serial)
+			if value is not None or not unique:
+				RowIndexes.discard(index,value,serial)
+
+	def edited(self,row,pos=None):
+		serial = self.rowSerials.get(id(row)) if pos is None else self.serials[pos]
+		if serial is None:
+			return False
+		for field,(unique,plan,index,keys) in self.fields.items():
+			value = ParamMulti.fieldValue(row,plan)
+			old = keys[serial]
+			if value == old and type(value) is type(old):
+				continue
+			if old is not None or not unique:
+				RowIndexes.discard(index,old,serial)
+			keys[serial] = value
+			if value is not None or not unique:
+				bisect.insort(index.setdefault(value,[]),serial)
+		return True
+
+	@staticmethod
+	def discard(index,value,serial):
+		serials = index[value]
+		serials.remove(serial)
+		if len(serials) == 0:
+			del index[value]
+
+##############
+## RowList
+##############
+class RowList(list):
+	"""
+		The ``RowList`` class
+		=====================
+
+		Value sets of a 'param' or 'shared' ParamMulti. A list that tells
+		its ParamMulti when it is edited in place (``del multi.values[0]``,
+		``multi.values.append(row)``...), so caches, saves and the journal
+		see the change as they see addRow and removeRow.
+	"""
+	__slots__ = ('schema',)
+
+	def __init__(self,schema,rows=()):
+		list.__init__(self,rows)
+		self.schema = schema
+
+	def __reduce__(self):
+		return (RowList,(self.schema,list(self)))
+
+	def edited(self,op='rows',value=None):
+		self.schema.rowsChanged(self,op,value)
+
+	def adopt(self,rows):
+		for row in rows:
+			if isinstance(row,Param):
+				self.schema.adopt(row)
+		return rows
+
+	def position(self,index):
+		return index + len(self) if index < 0 else index
+
+	def __setitem__(self,index,row):
+		if isinstance(index,slice):
+			row = self.adopt(list(row))
+		else:
+			self.adopt([row])
+		list.__setitem__(self,index,row)
+		self.edited()
+
+	def __delitem__(self,index):
+		if isinstance(index,slice):
+			list.__delitem__(self,index)
+			self.edited()
+			return
+		index = self.position(index)
+		list.__delitem__(self,index)
+		self.edited('del',index)
+
+	def __setslice__(self,start,stop,rows):
+		list.__setslice__(self,start,stop,self.adopt(list(rows)))
+		self.edited()
+
+	def __delslice__(self,start,stop):
+		list.__delslice__(self,start,stop)
+		self.edited()
+
+	def __iadd__(self,rows):
+		list.extend(self,self.adopt(list(rows)))
+		self.edited()
+		return self
+
+	def __imul__(self,count):
+		list.__imul__(self,count)
+		self.edited()
+		return self
+
+	def append(self,row):
+		self.adopt([row])
+		list.append(self,row)
+		self.edited('add',row)
+
+	def extend(self,rows):
+		list.extend(self,self.adopt(list(rows)))
+		self.edited()
+
+	def insert(self,index,row):
+		self.adopt([row])
+		list.insert(self,index,row)
+		self.edited()
+
+	def pop(self,index=-1):
+		index = self.position(index)
+		row = list.pop(self,index)
+		self.edited('del',index)
+		return row
+
+	def remove(self,row):
+		del self[self.index(row)]
+
+	def reverse(self):
+		list.reverse(self)
+		self.edited()
+
+	def sort(self,*args,**kwargs):
+		list.sort(self,*args,**kwargs)
+		self.edited()
+
+##############
+## RowStore
+##############
+MISSING = object()
+
+class RowStore(object):
+	"""
+		The ``RowStore`` class
+		======================
+
+		Base of ColumnStore and LazyRows, which keep the value sets of a
+		ParamMulti as data: the list API of the value sets. A Param is
+		built for a value set when it is accessed, and only kept while it
+		is used elsewhere (``rows`` holds it weakly); its edits are written
+		back to the store by ``edited``.
+
+		Subclasses store the value sets through rowData, writeRow,
+		insertRows and removeRow.
+	"""
+	def __getstate__(self):
+		state = dict(self.__dict__)
+		state['rows'] = None
+		return state
+
+	def __setstate__(self,state):
+		self.__dict__.update(state)
+		self.rows = weakref.WeakValueDictionary()
+
+	def __repr__(self):
+		return str(self)
+
+	def __iter__(self):
+		for pos in xrange(len(self)):
+			yield self[pos]
+
+	def position(self,key):
+		if not isinstance(key,(int,long)):
+			raise TypeError(type(self).__name__ + " indices must be integers, not " + str(type(key)))
+		if key < 0:
+			key += len(self)
+		if key < 0 or key >= len(self):
+			raise IndexError("list index out of range")
+		return key
+
+	def __getitem__(self,key):
+		if isinstance(key,slice):
+			return [self[pos] for pos in xrange(*key.indices(len(self)))]
+		key = self.position(key)
+		row = self.rows.get(key)
+		if row is None:
+			row = self.schema.buildRow(self.rowData(key))
+			self.rows[key] = row
+		return row
+
+	def __setitem__(self,key,row):
+		key = self.position(key)
+		self.writeRow(key,self.rowJSON(row))
+		self.keep(key,row)
+		self.schema.rowsChanged(self,'rows')
+
+	def __delitem__(self,key):
+		if isinstance(key,slice):
+			for pos in sorted(xrange(*key.indices(len(self))),reverse=True):
+				del self[pos]
+			return
+		key = self.position(key)
+		self.removeRow(key)
+		self.rows = weakref.WeakValueDictionary((pos if pos < key else pos-1,row) for pos,row in self.rows.items() if pos != key)
+		self.schema.rowsChanged(self,'del',key)
+
+	def append(self,row):
+		self.extend([row])
+
+	def extend(self,rows):
+		rows = list(rows)
+		start = len(self)
+		self.insertRows(start,[self.rowJSON(row) for row in rows])
+		for pos,row in enumerate(rows):
+			self.keep(start + pos,row)
+		if len(rows) == 1:
+			self.schema.rowsChanged(self,'add',rows[0])
+		else:
+			self.schema.rowsChanged(self,'rows')
+
+	def insert(self,key,row):
+		key = max(0,min(len(self),key + len(self) if key < 0 else key))
+		self.insertRows(key,[self.rowJSON(row)])
+		self.rows = weakref.WeakValueDictionary((pos if pos < key else pos+1,stored) for pos,stored in self.rows.items())
+		self.keep(key,row)
+		self.schema.rowsChanged(self,'rows')
+
+	def pop(self,key=-1):
+		row = self[key]
+		del self[key]
+		return row
+
+	def index(self,row):
+		pos = self.positionOf(row)
+		if pos is None:
+			raise ValueError("value set not in " + str(self.schema.id))
+		return pos
+
+	def remove(self,row):
+		del self[self.index(row)]
+
+	def rowJSON(self,row):
+		if isinstance(row,dict):
+			return row
+		if isinstance(row,(Param,ParamRow)):
+			return row.getValues(hidePassword=False)
+		raise ParamExceptions.WrongValue('401',str(row) + ' not correct for ' + str(self.schema.id))
+
+	def keep(self,key,row):
+		if isinstance(row,Param):
+			self.rows[key] = self.schema.adopt(row)
+		else:
+			self.rows.pop(key,None)
+
+	def positionOf(self,row):
+		for pos,stored in self.rows.items():
+			if stored is row:
+				return pos
+		return None
+
+	def edited(self,row):
+		"""
+			Write back the values of ``row``, a value set built by this
+			store, and return its position (None for another Param).
+		"""
+		pos = self.positionOf(row)
+		if pos is not None:
+			self.writeRow(pos,row.getValues(hidePassword=False))
+		return pos
+
+	def isMaterialized(self,key):
+		return key in self.rows
+
+##############
+## ColumnStore
+##############
+class ColumnStore(RowStore):
+	def __init__(self,schema):
+		self.schema = schema
+		self.layout = ColumnStore.flatten(schema,())
+		self.columns = [ColumnStore.newColumn(item) for path,item in self.layout]
+		self.count = 0
+		self.rows = weakref.WeakValueDictionary()
+
+	@staticmethod
+	def flatten(param,prefix):
+		layout = []
+		for item in param.items:
+			path = prefix + (item.id,)
+			if isinstance(item,Param) and not isinstance(item,ParamMulti):
+				layout.extend(ColumnStore.flatten(item,path))
+			else:
+				layout.append((path,item))
+		return layout
+
+	@staticmethod
+	def newColumn(item,values=[]):
+		if isinstance(item,Param):
+			return Columns.ObjectColumn(values)
+		return Columns.newColumn(item.type,values)
+
+	def __str__(self):
+		return '<ColumnStore {0} ({1} columns, ValueSets:{2})>'.format(self.schema.id,str(len(self.columns)),str(self.count))
+
+	def __len__(self):
+		return self.count
+
+	def rowData(self,key):
+		return self.rowValues(key,hidePassword=False)
+
+	def writeRow(self,key,row):
+		values = {}
+		self.convertRows(self.schema,(),[row],values)
+		for (path,item),column in zip(self.layout,self.columns):
+			column[key] = values[path][0]
+
+	def insertRows(self,key,rows):
+		values = {}
+		self.convertRows(self.schema,(),rows,values)
+		for (path,item),column in zip(self.layout,self.columns):
+			if key == self.count:
+				column.extend(values[path])
+			else:
+				for pos,value in enumerate(values[path]):
+					column.insert(key + pos,value)
+		self.count += len(rows)
+
+	def removeRow(self,key):
+		for column in self.columns:
+			del column[key]
+		self.count -= 1
+
+	def convertRows(self,param,prefix,rows,values):
+		for row in rows:
+			if not isinstance(row,dict):
+				raise ParamExceptions.WrongValue('401',str(row) + ' not correct for ' + str(param.id))
+			for key in row.keys():
+				if str(key) not in param.layout:
+					raise ParamExceptions.WrongValue('403',str(key) + ' not correct for ' + str(param.id))
+		for item in param.items:
+			path = prefix + (item.id,)
+			if isinstance(item,ParamMulti):
+				values[path] = [item.loadRows(row[item.id]) if item.id in row else [] for row in rows]
+			elif isinstance(item,Param):
+				self.convertRows(item,path,[row[item.id] if item.id in row else {} for row in rows],values)
+			else:
+				values[path] = ColumnStore.convertColumn(item,[row.get(item.id,MISSING) for row in rows])
+
+	@staticmethod
+	def convertColumn(item,column):
+		plan = item.plan
+		result = []
+		for value in column:
+			if value is MISSING:
+				value = item.value
+			elif value is not None:
+				value = plan(value,True)
+				if value is INVALID:
+					raise ParamExceptions.WrongValue(401,str(column[len(result)]) + ' not correct for ' + str(item.type))
+			result.append(value)
+		return result
+
+	def exportColumns(self,hidePassword):
+		columns = {}
+		for (path,item),column in zip(self.layout,self.columns):
+			if isinstance(item,ParamMulti):
+				columns[path] = [item.exportRows(rows,hidePassword) for rows in column.data]
+			elif hidePassword and item.type == 'password':
+				columns[path] = ['****'] * self.count
+			else:
+				columns[path] = column.values()
+		return columns
+
+	def assemble(self,param,prefix,columns):
+		keys = []
+		values = []
+		for item in param.items:
+			path = prefix + (item.id,)
+			keys.append(item.id)
+			if isinstance(item,Param) and not isinstance(item,ParamMulti):
+				values.append(self.assemble(item,path,columns))
+			else:
+				values.append(columns[path])
+		if len(keys) == 0:
+			return [{} for pos in xrange(self.count)]
+		return [dict(zip(keys,row)) for row in zip(*values)]
+
+	def rowValues(self,key,hidePassword=True):
+		result = {}
+		for (path,item),column in zip(self.layout,self.columns):
+			node = result
+			for id in path[:-1]:
+				node = node.setdefault(id,{})
+			if isinstance(item,ParamMulti):
+				node[path[-1]] = item.exportRows(column[key],hidePassword)
+			elif hidePassword and item.type == 'password':
+				node[path[-1]] = '****'
+			else:
+				node[path[-1]] = column[key]
+		return result
+
+	def getValues(self,hidePassword=True):
+		return self.assemble(self.schema,(),self.exportColumns(hidePassword))
+
+	def copyTo(self,schema):
+		newone = ColumnStore(schema)
+		for pos,((path,item),column) in enumerate(zip(self.layout,self.columns)):
+			if isinstance(item,ParamMulti):
+				newone.columns[pos] = ColumnStore.newColumn(item,[newone.layout[pos][1].copyRows(rows) for rows in column.data])
+			else:
+				newone.columns[pos] = column.copy()
+		newone.count = self.count
+		return newone
+
+##############
+## LazyRows
+##############
+class LazyRows(RowStore):
+	"""
+		The ``LazyRows`` class
+		======================
+
+		Value sets of a 'lazy' ParamMulti. Rows are kept as the JSON dicts they
+		were loaded from and a Param is only built for a row when it is
+		accessed; rows never edited are exported and saved as they are.
+
+		Rows are validated (and completed with default values) when added,
+		unless the ParamMulti has ``deferValidation`` set: a wrong row is then
+		only reported when it is accessed, and saved back untouched otherwise.
+	"""
+	def __init__(self,schema):
+		self.schema = schema
+		self.entries = []
+		self.rows = weakref.WeakValueDictionary()
+
+	def __str__(self):
+		return '<LazyRows {0} (ValueSets:{1}, Materialized:{2})>'.format(self.schema.id,str(len(self.entries)),str(len(self.entries)-self.countRaw()))
+
+	def __len__(self):
+		return len(self.entries)
+
+	def countRaw(self):
+		return len(self.entries) - len(self.rows)
+
+	def rowData(self,key):
+		return LazyRows.copyJSON(self.entries[key])
+
+	def checkEntry(self,row):
+		if not isinstance(row,dict):
+			raise ParamExceptions.WrongValue('401',str(row) + ' not correct for ' + str(self.schema.id))
+		if self.schema.deferValidation:
+			return row
+		return LazyRows.checkRow(self.schema,row)
+
+	def writeRow(self,key,row):
+		self.entries[key] = self.checkEntry(row)
+
+	def insertRows(self,key,rows):
+		self.entries[key:key] = [self.checkEntry(row) for row in rows]
+
+	def removeRow(self,key):
+		del self.entries[key]
+
+	@staticmethod
+	def checkRow(param,row):
+		if not isinstance(row,dict):
+			raise ParamExceptions.WrongValue('401',str(row) + ' not correct for ' + str(param.id))
+		for key in row.keys():
+			if str(key) not in param.layout:
+				raise ParamExceptions.WrongValue('403',str(key) + ' not correct for ' + str(param.id))
+		result = {}
+		for item in param.items:
+			value = row.get(item.id,MISSING)
+			if isinstance(item,ParamMulti):
+				if value is MISSING:
+					value = []
+				elif isinstance(value,dict):
+					value = [value]
+				elif not isinstance(value,list):
+					raise ParamExceptions.WrongValue('401',str(value) + ' not correct for ' + str(item.id))
+				result[item.id] = [LazyRows.checkRow(item,sub) for sub in value]
+			elif isinstance(item,Param):
+				result[item.id] = LazyRows.checkRow(item,{} if value is MISSING else value)
+			elif value is MISSING:
+				result[item.id] = item.value
+			else:
+				result[item.id] = item.checkValue(value)
+		return result
+
+	@staticmethod
+	def copyJSON(value):
+		if type(value) is dict:
+			return dict((key,LazyRows.copyJSON(sub)) for key,sub in value.iteritems())
+		if type(value) is list:
+			return [LazyRows.copyJSON(sub) for sub in value]
+		return value
+
+	@staticmethod
+	def exportRow(param,row,hidePassword):
+		if not hidePassword:
+			return LazyRows.copyJSON(row)
+		result = {}
+		for key,value in row.items():
+			pos = param.layout.get(str(key))
+			item = param.items[pos] if pos is not None else None
+			if isinstance(item,ParamMulti):
+				if isinstance(value,list):
+					value = [LazyRows.exportRow(item,sub,hidePassword) if isinstance(sub,dict) else sub for sub in value]
+				elif isinstance(value,dict):
+					value = LazyRows.exportRow(item,value,hidePassword)
+			elif isinstance(item,Param) and isinstance(value,dict):
+				value = LazyRows.exportRow(item,value,hidePassword)
+			elif isinstance(item,ConfigElement) and item.type == 'password':
+				value = '****'
+			else:
+				value = LazyRows.copyJSON(value)
+			result[key] = value
+		return result
+
+	def getValues(self,hidePassword=True):
+		return [LazyRows.exportRow(self.schema,entry,hidePassword) for entry in self.entries]
+
+	def dumpValues(self):
+		return '[' + ', '.join(json.dumps(entry,ensure_ascii=False) for entry in self.entries) + ']'
+
+	def copyTo(self,schema):
+		newone = LazyRows(schema)
+		newone.entries = [LazyRows.copyJSON(entry) for entry in self.entries]
+		return newone
+
+
+
 
 '''
 if __name__ == '__main__':